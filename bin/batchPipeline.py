@@ -0,0 +1,83 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*
+
+# Copyright 2020 Actian Corporation
+
+#    Licensed under the Apache License, Version 2.0 (the "License");
+#    you may not use this file except in compliance with the License.
+#    You may obtain a copy of the License at
+
+#      http://www.apache.org/licenses/LICENSE-2.0
+
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS,
+#    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#    See the License for the specific language governing permissions and
+#    limitations under the License.
+
+import sys
+import Queue
+from threading import Thread, Event
+
+# seconds between two checks of the stop request by a reader blocked on a full queue
+put_timeout = 0.1
+
+
+class BatchPipeline:
+    """
+        Reader stage of a copy_table_data task (--pipeline): a thread takes the batches of a generator
+        (source fetch and row encoding) into a queue of at most depth batches, while the task inserts the
+        previous ones into the target. A full queue blocks the reader until the writer catches up
+        (backpressure), so memory stays bounded. Iterating the pipeline gives the batches in order and
+        raises the error of the reader, if any.
+    """
+
+    def __init__(self, batches, depth):
+        """
+            @:param batches generator of the batches
+            @:param depth batches read ahead
+        """
+        self.queue = Queue.Queue(depth)
+        self.stopped = Event()
+        self.thread = Thread(target=self.read, args=(batches,))
+        self.thread.daemon = True
+        self.thread.start()
+
+    def read(self, batches):
+        try:
+            for batch in batches:
+                if not self.put((batch, None)):
+                    return
+            self.put((None, None))
+        except Exception:
+            self.put((None, sys.exc_info()))
+        finally:
+            batches.close()
+
+    def put(self, item):
+        """
+            @:return: False when the writer stopped before the item could be queued
+        """
+        while not self.stopped.is_set():
+            try:
+                self.queue.put(item, timeout=put_timeout)
+                return True
+            except Queue.Full:
+                pass
+        return False
+
+    def __iter__(self):
+        while True:
+            (batch, error) = self.queue.get()
+            if error is not None:
+                raise error[0], error[1], error[2]
+            if batch is None:
+                return
+            yield batch
+
+    def close(self):
+        """
+            Stop the reader (the writer may stop before the end, e.g. --maxrows) and wait for it
+        """
+        self.stopped.set()
+        self.thread.join()
@@ -0,0 +1,87 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*
+
+# Copyright 2020 Actian Corporation
+
+#    Licensed under the Apache License, Version 2.0 (the "License");
+#    you may not use this file except in compliance with the License.
+#    You may obtain a copy of the License at
+
+#      http://www.apache.org/licenses/LICENSE-2.0
+
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS,
+#    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#    See the License for the specific language governing permissions and
+#    limitations under the License.
+
+# rows of the first batch of a task and bounds of the batch size
+initial_rows = 100
+min_rows = 10
+max_rows = 100000
+# an insert slower than this (seconds) holds the target locks and log too long: the batch shrinks
+max_seconds = 2.0
+# weight of the last batch in the average row size
+row_size_weight = 0.3
+# rows/s lost by a bigger batch before the growth stops
+tolerance = 0.9
+
+
+class BatchSizer:
+    """
+        --batchsize auto: rows of the next batch of a copy_table_data task from the insert time and
+        the estimated size of the previous ones. The batch doubles while the rows/s of the target
+        improve, and goes back to the best size seen once a bigger batch is not faster. The statement
+        size budget bounds it, from the average row size, so wide rows get fewer rows per batch.
+        An insert slower than max_seconds halves it.
+    """
+
+    def __init__(self, max_bytes):
+        """
+            @:param max_bytes statement size budget of a batch
+        """
+        self.max_bytes = max_bytes
+        self.rows = initial_rows
+        self.row_size = None
+        # (rows/s, rows) of the fastest batch size seen
+        self.best = (0.0, initial_rows)
+        self.growing = True
+
+    def limit(self):
+        """
+            @:return: rows of a batch within the statement size budget
+        """
+        if not self.row_size:
+            return max_rows
+        return max(min_rows, min(max_rows, int(self.max_bytes / self.row_size)))
+
+    def update(self, rows, size, seconds):
+        """
+            Account an inserted batch and size the next one
+            @:param rows rows of the batch
+            @:param size estimated bytes of the batch
+            @:param seconds insert time of the batch
+        """
+        if rows <= 0:
+            return
+        row_size = float(size) / rows
+        self.row_size = row_size if self.row_size is None else \
+            row_size_weight * row_size + (1 - row_size_weight) * self.row_size
+        rate = rows / max(seconds, 0.000001)
+
+        if seconds > max_seconds:
+            self.rows = rows / 2
+            self.best = (rate, self.rows)
+            self.growing = False
+        elif rows < self.rows and size < self.max_bytes:
+            # last batch of the task, --maxrows or a batch read before the last update (--pipeline)
+            pass
+        elif rate < self.best[0] * tolerance:
+            self.rows = self.best[1]
+            self.growing = False
+        else:
+            if rate > self.best[0]:
+                self.best = (rate, rows)
+            if self.growing:
+                self.rows = rows * 2
+        self.rows = max(min_rows, min(self.rows, self.limit()))
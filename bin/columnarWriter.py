@@ -0,0 +1,168 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*
+
+# Copyright 2020 Actian Corporation
+
+#    Licensed under the Apache License, Version 2.0 (the "License");
+#    you may not use this file except in compliance with the License.
+#    You may obtain a copy of the License at
+
+#      http://www.apache.org/licenses/LICENSE-2.0
+
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS,
+#    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#    See the License for the specific language governing permissions and
+#    limitations under the License.
+
+import os
+import re
+import hashlib
+from decimal import Decimal, Context
+from collections import OrderedDict
+from unloadWriter import UnloadWriter
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+# --unload-format value -> file suffix (text files are written by UnloadWriter)
+unload_formats = OrderedDict([('text', '.txt'), ('parquet', '.parquet'), ('arrow', '.arrow')])
+
+# target data type (DDL of generate_tables) -> arrow type, the other types are unloaded as strings
+_integer_types = {'TINYINT': 'int8', 'INTEGER1': 'int8', 'SMALLINT': 'int16', 'INTEGER2': 'int16',
+                  'INT': 'int32', 'INTEGER': 'int32', 'INTEGER4': 'int32', 'INT4': 'int32',
+                  'BIGINT': 'int64', 'INTEGER8': 'int64', 'INT8': 'int64'}
+_float_types = {'FLOAT4': 'float32', 'REAL': 'float32',
+                'FLOAT': 'float64', 'FLOAT8': 'float64', 'DOUBLE': 'float64', 'DOUBLE PRECISION': 'float64'}
+_binary_types = ('BYTE', 'VARBYTE', 'BINARY', 'VARBINARY', 'LONG BYTE', 'BLOB')
+# widest decimal of the arrow decimal128 type
+max_decimal_precision = 38
+# quantizes to the widest decimal: the default context holds 28 digits
+DECIMAL_CONTEXT = Context(prec=max_decimal_precision)
+
+
+def arrow_type(target_type):
+    """
+        @:param target_type data type of the target column, e.g. DECIMAL(12,2) or TIMESTAMP WITH TIME ZONE
+        @:return: arrow type of the column
+    """
+    name = re.sub(r'\s*\(.*?\)', '', target_type.upper()).strip()
+    args = re.findall(r'\d+', target_type.split('(', 1)[1]) if '(' in target_type else []
+    if name in _integer_types:
+        return getattr(pyarrow, _integer_types[name])()
+    if name in _float_types:
+        return getattr(pyarrow, _float_types[name])()
+    if name in ('DECIMAL', 'NUMERIC') and args and int(args[0]) <= max_decimal_precision:
+        return pyarrow.decimal128(int(args[0]), int(args[1]) if len(args) > 1 else 0)
+    if name in ('DATE', 'ANSIDATE'):
+        return pyarrow.date32()
+    if name.startswith('TIMESTAMP'):
+        return pyarrow.timestamp('us', tz='UTC' if 'TIME ZONE' in name and 'WITHOUT' not in name else None)
+    if name.startswith('TIME') and 'ZONE' not in name:
+        return pyarrow.time64('us')
+    if name in ('BOOLEAN', 'BOOL'):
+        return pyarrow.bool_()
+    if name in _binary_types:
+        return pyarrow.binary()
+    return pyarrow.string()
+
+
+class ColumnarWriter(UnloadWriter):
+    """
+        --unload-format parquet|arrow: rows of an unloaded table as typed columns instead of delimited lines.
+        The arrow type of every column comes from its target data type, so numbers and temporal values
+        keep their precision and the loader parses no text. Rows are buffered and written as a record
+        batch of row_group_size rows: a Parquet row group or an Arrow IPC (file format) batch. Parquet
+        files are compressed by the Parquet codec (--compress, snappy by default). The file is described
+        in the manifest like the delimited files.
+    """
+
+    def __init__(self, fname, unload_format, columns, row_group_size, compression=None):
+        """
+            @:param fname file of the table, its suffix is replaced by the one of the format
+            @:param columns [(column name, target data type)]
+            @:param row_group_size rows of a row group (record batch)
+        """
+        UnloadWriter.__init__(self, os.path.splitext(fname)[0] + unload_formats[unload_format],
+                              compression or ('snappy' if unload_format == 'parquet' else None))
+        self.unload_format = unload_format
+        self.row_group_size = row_group_size
+        self.schema = pyarrow.schema([pyarrow.field(name, arrow_type(target_type)) for (name, target_type) in columns])
+        self.strings = [field.type == pyarrow.string() for field in self.schema]
+        # unit of the last digit of the decimal columns, None for the other ones
+        self.decimals = [Decimal(1).scaleb(-field.type.scale) if pyarrow.types.is_decimal(field.type) else None
+                         for field in self.schema]
+        self.writer = None
+        self.rows = []
+
+    def chunk_name(self, number):
+        return self.fname
+
+    def open(self):
+        fname = self.chunk_name(len(self.chunks) + 1)
+        if self.unload_format == 'parquet':
+            self.writer = pyarrow.parquet.ParquetWriter(fname, self.schema, compression=self.compression)
+        else:
+            self.f = pyarrow.OSFile(fname, 'wb')
+            self.writer = pyarrow.RecordBatchFileWriter(self.f, self.schema)
+        self.chunk = OrderedDict([('file', fname), ('rows', 0), ('bytes', 0), ('stored_bytes', 0),
+                                  ('row_groups', 0), ('sha256', None)])
+        self.chunks.append(self.chunk)
+
+    def write(self, row, size=0):
+        """
+            @:param row values of a row, in the order of the columns
+            @:param size estimated bytes of the values
+        """
+        if self.writer is None:
+            self.open()
+        self.rows.append(row)
+        self.chunk['rows'] += 1
+        self.chunk['bytes'] += size
+        if len(self.rows) >= self.row_group_size:
+            self.flush()
+
+    def flush(self):
+        if not self.rows:
+            return
+        arrays = []
+        for (i, field) in enumerate(self.schema):
+            values = [row[i] for row in self.rows]
+            if self.strings[i]:
+                # columns without an arrow type of their own (e.g. INTERVAL, UUID) are unloaded as text
+                values = [value if value is None or isinstance(value, unicode) else unicode(value)
+                          for value in values]
+            elif self.decimals[i] is not None:
+                # NUMBER(p,s) comes as float from cx_Oracle (and SQLite): repr keeps its digits
+                values = [value if value is None else
+                          (value if isinstance(value, Decimal) else
+                           Decimal(repr(value) if isinstance(value, float) else value)).quantize(self.decimals[i], context=DECIMAL_CONTEXT)
+                          for value in values]
+            arrays.append(pyarrow.array(values, type=field.type))
+        batch = pyarrow.RecordBatch.from_arrays(arrays, [field.name for field in self.schema])
+        if self.unload_format == 'parquet':
+            self.writer.write_table(pyarrow.Table.from_batches([batch]), row_group_size=len(self.rows))
+        else:
+            self.writer.write_batch(batch)
+        self.chunk['row_groups'] += 1
+        self.rows = []
+
+    def close(self):
+        if self.writer is None:
+            # no row: a file with the schema only
+            self.open()
+        self.flush()
+        self.writer.close()
+        self.writer = None
+        if self.f is not None:
+            self.f.close()
+            self.f = None
+        checksum = hashlib.sha256()
+        with open(self.chunk['file'], 'rb') as f:
+            for data in iter(lambda: f.read(1024 * 1024), ''):
+                checksum.update(data)
+                self.chunk['stored_bytes'] += len(data)
+        self.chunk['sha256'] = checksum.hexdigest()
@@ -24,11 +24,46 @@
 ##    bolke01  10-09-19          Added verbose option 
 ##    cooda09    31-03-20        Added filetag option 
 
+import fnmatch
 import multiprocessing
+import os
 import re
 import sys
 import logging
 from copy import deepcopy
+from unloadWriter import compressions, compression_available
+import columnarWriter
+
+# glob characters allowed in --include/--exclude names
+glob_regexp = re.compile(r"[*?\[]")
+
+
+class NameFilter:
+    """
+        --include/--exclude names compiled once: exact names in a frozenset, glob patterns
+        (e.g. SALES_*, ORDERS.*_ID) in a single regex. Names are compared upper-cased.
+    """
+
+    def __init__(self, patterns):
+        names = set()
+        globs = []
+        for pattern in patterns:
+            pattern = pattern.upper()
+            if glob_regexp.search(pattern):
+                globs.append(fnmatch.translate(pattern))
+            else:
+                names.add(pattern)
+        self.names = frozenset(names)
+        self.regexp = re.compile('|'.join(globs)) if globs else None
+
+    def __nonzero__(self):
+        return bool(self.names) or self.regexp is not None
+
+    def match(self, name):
+        """
+            @:param name upper-cased table or table.column name
+        """
+        return name in self.names or (self.regexp is not None and self.regexp.match(name) is not None)
 
 
 class ConversionParameters:
@@ -64,6 +99,12 @@ class ConversionParameters:
         self.index_separator = ''
         self.maxrows = 100000
         self.batchsize = 500
+        # --batchsize auto: batch size adapted by every load task to the insert time (see BatchSizer),
+        # within a statement size budget in KB
+        self.batch_adaptive = False
+        self.statement_size = 1024
+        # rows fetched per round trip when reading table data from @src
+        self.arraysize = 1000
         self.charmax = 6400
         self.loadtest = False
         self.truncate = False
@@ -79,6 +120,18 @@ class ConversionParameters:
         self.load_cpvwl = False
         # X100 only
         self.load_vwload = False
+        # stream the unload to the bulk loader through a named pipe instead of a file
+        self.use_fifo = False
+        # --unload files: compression (None, gzip, zstd or lz4) and MB of lines per file, 0 for one file per table
+        self.unload_compression = None
+        self.split_size = 0
+        # --unload files: delimited text or typed columns (parquet or arrow) written in row groups of this number of rows
+        self.unload_format = 'text'
+        self.row_group_size = 100000
+        # parallelism given to the bulk loader of each table
+        self.load_parallelism = 1
+        # load data with parameterized INSERT sent in batches (cursor.executemany)
+        self.executemany = False
 
         # Run the script through ignoring all errors
         self.continue_on_error = False
@@ -106,11 +159,51 @@ class ConversionParameters:
         self.loadmethod = 'serial'
         # number of threads for data loading
         self.threads = 1
-        # regex to match the table
-        self.table_regexp = re.compile(r"^\w+$")
-        # regex to match the table.column
-        self.table_column_regexp = re.compile(r"^\w+\.\w+$")
+        # values (thread|process) - run the data loading workers as threads or processes
+        self.executor = 'thread'
+        # number of key ranges each table is split in for data loading
+        self.table_chunks = 1
+        # values (minmax|ntile) - how the key ranges are computed
+        self.chunk_method = 'minmax'
+        # compiled include/exclude lists (see compile_filters) and is_included decisions per (table, column)
+        self.compile_filters()
+        # regex to match the table (glob characters allowed)
+        self.table_regexp = re.compile(r"^[\w*?\[\]]+$")
+        # regex to match the table.column (glob characters allowed)
+        self.table_column_regexp = re.compile(r"^[\w*?\[\]]+\.[\w*?\[\]]+$")
         self.filetag = False
+        # query the source catalog again instead of reusing the metadata cache of a previous run
+        self.refresh_metadata = False
+        # reuse the metadata cached by a previous run (see ConvertorUtil.load_metadata_cache)
+        self.metadata_cache = False
+        # continue the load recorded in the checkpoint journal of the previous run
+        self.resume = False
+        # --delta: [(table, watermark column)] (glob characters allowed in table) and how the rows
+        # changed since the previous pass reach the target (upsert or append)
+        self.delta_columns = []
+        self.delta_mode = 'upsert'
+        # order of the load tasks (largest first or catalog order) and size in MB up to which small tables are
+        # packed in one task
+        self.schedule = 'largest'
+        self.pack_size = 0
+        # seconds between two refreshes of the load progress line and status file, 0 to disable them
+        self.progress_interval = 10
+        # --commit-every: commit the rows loaded every N rows, every N seconds or once per table (or --chunks
+        # range), 0/False: every --batchsize batch
+        self.commit_rows = 0
+        self.commit_seconds = 0
+        self.commit_table = False
+        # batches fetched and encoded ahead by the reader thread of every load task, 0: no reader thread
+        self.pipeline_depth = 0
+        # cProfile statistics and memory snapshots of the run (see RunProfiler), of every load task too
+        self.profile = False
+        self.trace_memory = False
+        self.profile_tasks = False
+        # --loadtest: rows and columns of the synthetic table, seed types to use and load paths to measure
+        self.bench_rows = 10000
+        self.bench_width = 12
+        self.bench_types = []
+        self.bench_paths = ['row', 'multirow', 'executemany', 'bulk']
 
     @property
     def bin_dir_path(self):
@@ -162,6 +255,8 @@ class ConversionParameters:
                 if self.maxrows < 1 or self.maxrows > 1000000:
                     self.logger.error("'{0}' is not a valid 'maxrows' value. Valid values are [1..1000000].".format(val))
                     sys.exit(1)
+            elif opt == "--batchsize" and arg.strip().lower() == 'auto':
+                self.batch_adaptive = True
             elif opt == "--batchsize":
                 val = arg.strip()
                 self.batchsize = int(val) if val.isdigit else -1
@@ -169,6 +264,13 @@ class ConversionParameters:
                     self.logger.error("'{0}' is not a valid 'batchsize' value. Valid values are [10..10000]."
                                       .format(val))
                     sys.exit(1)
+            elif opt == "--arraysize":
+                val = arg.strip()
+                self.arraysize = int(val) if val.isdigit() else -1
+                if self.arraysize < 1 or self.arraysize > 1000000:
+                    self.logger.error("'{0}' is not a valid 'arraysize' value. Valid values are [1..1000000]."
+                                      .format(val))
+                    sys.exit(1)
             elif opt == "--charmax":
                 val = arg.strip()
                 self.charmax = int(val) if val.isdigit else -1
@@ -264,6 +366,48 @@ class ConversionParameters:
                     self.logger.error("'{0}' is not a valid '--threads' value. Valid values are [1..{1}]"
                                       .format(val, thread_limit))
                     sys.exit(1)
+            elif opt == "--executor":
+                self.executor = arg.strip().lower()
+                if self.executor not in ('thread', 'process'):
+                    self.logger.error("'{0}' is not a valid '--executor' value. Valid values are "
+                                      "[thread, process].".format(self.executor))
+                    sys.exit(1)
+            elif opt == "--chunks":
+                val = arg.strip()
+                self.table_chunks = int(val) if val.isdigit() else -1
+                if self.table_chunks < 1 or self.table_chunks > 720:
+                    self.logger.error("'{0}' is not a valid '--chunks' value. Valid values are [1..720]".format(val))
+                    sys.exit(1)
+            elif opt == "--chunkmethod":
+                self.chunk_method = arg.strip().lower()
+                if self.chunk_method not in ('minmax', 'ntile'):
+                    self.logger.error("'{0}' is not a valid '--chunkmethod' value. Valid values are "
+                                      "[minmax, ntile].".format(self.chunk_method))
+                    sys.exit(1)
+            elif opt == "--benchrows":
+                val = arg.strip()
+                self.bench_rows = int(val) if val.isdigit() else -1
+                if self.bench_rows < 1 or self.bench_rows > 10000000:
+                    self.logger.error("'{0}' is not a valid '--benchrows' value. Valid values are [1..10000000]."
+                                      .format(val))
+                    sys.exit(1)
+            elif opt == "--benchwidth":
+                val = arg.strip()
+                self.bench_width = int(val) if val.isdigit() else -1
+                if self.bench_width < 2 or self.bench_width > 1000:
+                    self.logger.error("'{0}' is not a valid '--benchwidth' value. Valid values are [2..1000]."
+                                      .format(val))
+                    sys.exit(1)
+            elif opt == "--benchtypes":
+                self.bench_types = [i.strip().lower() for i in arg.split(',') if i.strip()]
+            elif opt == "--benchpaths":
+                val = [i.strip().lower() for i in arg.split(',') if i.strip()]
+                invalid = [i for i in val if i not in ('row', 'multirow', 'executemany', 'bulk')]
+                if not val or invalid:
+                    self.logger.error("'{0}' is not a valid '--benchpaths' value. Valid values are "
+                                      "[row, multirow, executemany, bulk].".format(arg.strip()))
+                    sys.exit(1)
+                self.bench_paths = val
             elif opt == "--xx": self.xx = arg.strip()
             elif opt == "--mapping" :self.mapping = True
             elif opt == "--quiet" :self.quiet = True
@@ -296,6 +440,120 @@ class ConversionParameters:
                     sys.exit(1)
             elif opt == "--cpvwl":self.load_cpvwl = True
             elif opt == "--vwload":self.load_vwload = True
+            elif opt == "--executemany": self.executemany = True
+            elif opt == "--refresh-metadata": self.refresh_metadata = True
+            elif opt == "--metadata-cache": self.metadata_cache = True
+            elif opt == "--resume": self.resume = True
+            elif opt == "--profile": self.profile = True
+            elif opt == "--trace-memory": self.trace_memory = True
+            elif opt == "--profile-tasks": self.profile_tasks = True
+            elif opt == "--delta":
+                val = arg.strip()
+                if not val:
+                    self.logger.error("--delta value can't be empty")
+                    sys.exit(1)
+                for i in map(str.strip, val.split(',')):
+                    if not self.table_column_regexp.match(i):
+                        self.logger.error("The --delta value: '{0}' doesn't match table.column regexp.".format(i))
+                        sys.exit(1)
+                    self.delta_columns.append(tuple(i.rsplit('.', 1)))
+            elif opt == "--statementsize":
+                val = arg.strip()
+                self.statement_size = int(val) if val.isdigit() else -1
+                if self.statement_size < 1 or self.statement_size > 1048576:
+                    self.logger.error("'{0}' is not a valid '--statementsize' value. Valid values are [1..1048576]."
+                                      .format(val))
+                    sys.exit(1)
+            elif opt == "--pipeline":
+                val = arg.strip()
+                self.pipeline_depth = int(val) if val.isdigit() else -1
+                if self.pipeline_depth < 0 or self.pipeline_depth > 100:
+                    self.logger.error("'{0}' is not a valid '--pipeline' value. Valid values are [0..100]."
+                                      .format(val))
+                    sys.exit(1)
+            elif opt == "--commit-every":
+                val = arg.strip().lower()
+                if val == 'table':
+                    self.commit_table = True
+                elif val.endswith('s') and val[:-1].isdigit() and 0 < int(val[:-1]) <= 86400:
+                    self.commit_seconds = int(val[:-1])
+                elif val.isdigit() and 0 < int(val) <= 100000000:
+                    self.commit_rows = int(val)
+                else:
+                    self.logger.error("'{0}' is not a valid '--commit-every' value. Valid values are rows [1..100000000],"
+                                      " seconds followed by s [1s..86400s] or table.".format(arg.strip()))
+                    sys.exit(1)
+            elif opt == "--progress":
+                val = arg.strip()
+                self.progress_interval = int(val) if val.isdigit() else -1
+                if self.progress_interval < 0 or self.progress_interval > 3600:
+                    self.logger.error("'{0}' is not a valid '--progress' value. Valid values are [0..3600]."
+                                      .format(val))
+                    sys.exit(1)
+            elif opt == "--schedule":
+                val = arg.strip().lower()
+                if val not in ('largest', 'catalog'):
+                    self.logger.error("'{0}' is not a valid '--schedule' value. Valid values are [largest, catalog]."
+                                      .format(arg.strip()))
+                    sys.exit(1)
+                self.schedule = val
+            elif opt == "--packsize":
+                val = arg.strip()
+                self.pack_size = int(val) if val.isdigit() else -1
+                if self.pack_size < 0 or self.pack_size > 100000:
+                    self.logger.error("'{0}' is not a valid '--packsize' value. Valid values are [0..100000]."
+                                      .format(val))
+                    sys.exit(1)
+            elif opt == "--deltamode":
+                val = arg.strip().lower()
+                if val not in ('upsert', 'append'):
+                    self.logger.error("'{0}' is not a valid '--deltamode' value. Valid values are [upsert, append]."
+                                      .format(arg.strip()))
+                    sys.exit(1)
+                self.delta_mode = val
+            elif opt == "--compress":
+                val = arg.strip().lower()
+                if val not in compressions:
+                    self.logger.error("'{0}' is not a valid '--compress' value. Valid values are [{1}]."
+                                      .format(arg.strip(), ", ".join(compressions)))
+                    sys.exit(1)
+                self.unload_compression = val
+            elif opt == "--unload-format":
+                val = arg.strip().lower()
+                if val not in columnarWriter.unload_formats:
+                    self.logger.error("'{0}' is not a valid '--unload-format' value. Valid values are [{1}]."
+                                      .format(arg.strip(), ", ".join(columnarWriter.unload_formats)))
+                    sys.exit(1)
+                if val != 'text' and columnarWriter.pyarrow is None:
+                    self.logger.error("--unload-format {0} requires the python module 'pyarrow'.".format(val))
+                    sys.exit(1)
+                self.unload_format = val
+            elif opt == "--row-group":
+                val = arg.strip()
+                self.row_group_size = int(val) if val.isdigit() else -1
+                if self.row_group_size < 1000 or self.row_group_size > 10000000:
+                    self.logger.error("'{0}' is not a valid '--row-group' value. Valid values are [1000..10000000]."
+                                      .format(val))
+                    sys.exit(1)
+            elif opt == "--splitsize":
+                val = arg.strip()
+                self.split_size = int(val) if val.isdigit() else -1
+                if self.split_size < 0 or self.split_size > 1048576:
+                    self.logger.error("'{0}' is not a valid '--splitsize' value. Valid values are [0..1048576]."
+                                      .format(val))
+                    sys.exit(1)
+            elif opt == "--fifo":
+                if hasattr(os, 'mkfifo'):
+                    self.use_fifo = True
+                else:
+                    self.logger.warn("--fifo is not supported on this platform. Ignoring --fifo setting")
+            elif opt == "--parallelism":
+                val = arg.strip()
+                self.load_parallelism = int(val) if val.isdigit() else -1
+                if self.load_parallelism < 1 or self.load_parallelism > 64:
+                    self.logger.error("'{0}' is not a valid '--parallelism' value. Valid values are [1..64]."
+                                      .format(val))
+                    sys.exit(1)
             elif opt == "--filetag":
                 val = arg.strip().lower()
                 self.filetag = val
@@ -347,8 +605,82 @@ class ConversionParameters:
         if self.__is_include_exclude_conflict():
             self.logger.error("--include&--exclude values conflict detected. exit...")
             sys.exit(1)
+        if (self.unload_compression or self.unload_format != 'text') and (self.load_vwload or self.load_cpvwl):
+            self.logger.error("--compress and --unload-format can't be used with --vwload or --cpvwl: the bulk loader"
+                              " reads plain delimited files")
+            sys.exit(1)
+        if self.unload_format == 'text' and self.unload_compression and \
+                not compression_available(self.unload_compression):
+            self.logger.error("--compress {0} requires the python module '{1}'. Install it or use gzip."
+                              .format(self.unload_compression, compressions[self.unload_compression][1]))
+            sys.exit(1)
+        if self.unload_format == 'arrow' and self.unload_compression:
+            self.logger.error("--compress can't be used with --unload-format arrow")
+            sys.exit(1)
+        if self.unload_format != 'text' and self.split_size:
+            self.logger.warn("--splitsize is ignored with --unload-format {0}: one file per table, in row groups"
+                             " of --row-group rows".format(self.unload_format))
+            self.split_size = 0
+        if self.split_size and self.use_fifo:
+            self.logger.warn("--splitsize is ignored with --fifo: the bulk loader reads one pipe per table")
+            self.split_size = 0
+        self.compile_filters()
         self.set_index_separator()
 
+    def compile_filters(self):
+        """
+            Compile the --include/--exclude lists and reset the is_included decisions
+        """
+        self.include_table_filter = NameFilter(self.include_tables)
+        self.include_column_filter = NameFilter(self.include_columns)
+        self.exclude_table_filter = NameFilter(self.exclude_tables)
+        self.exclude_column_filter = NameFilter(self.exclude_columns)
+        self.included = {}
+
+    def is_included(self, table, col):
+        """
+            Decide (once per table and column) if table.column has to be processed
+            according to the --include/--exclude rules
+            :return: (decision, reason) where reason explains the decision for the log
+        """
+        key = (table, col)
+        result = self.included.get(key)
+        if result is None:
+            result = self.decide_included(table.upper(), col.upper())
+            self.included[key] = result
+        return result
+
+    def decide_included(self, table, col):
+        full_col_name = "{0}.{1}".format(table, col)
+        if self.include_table_filter or self.include_column_filter:
+            if self.include_table_filter.match(table):
+                if self.exclude_column_filter.match(full_col_name):
+                    return (False, "{0} is in exclude columns. Skipping...".format(full_col_name))
+                return (True, "{0} is not in exclude list. Take it...".format(full_col_name))
+            elif self.include_column_filter:
+                if self.include_column_filter.match(full_col_name):
+                    return (True, "{0} is in include columns list. Take it...".format(full_col_name))
+                return (False, "{0} is not in include columns list. Skipping...".format(full_col_name))
+            return (False, "{0} is not in include tables. Skipping...".format(table))
+        elif self.exclude_table_filter or self.exclude_column_filter:
+            if self.exclude_table_filter.match(table):
+                return (False, "{0} is in exclude tables. Skipping...".format(table))
+            elif self.exclude_column_filter:
+                if self.exclude_column_filter.match(full_col_name):
+                    return (False, "{0} is in exclude columns. Skipping...".format(full_col_name))
+                return (True, "{0} is not in exclude columns. Take it...".format(full_col_name))
+            return (True, "{0} is not in exclude list. Take it...".format(table))
+        return (True, "Column '{0}' exclude&include rules not set. Take it...".format(full_col_name))
+
+    def watermark_column(self, table):
+        """
+            :return: the --delta watermark column of table, None when the table is copied in full
+        """
+        for (pattern, column) in self.delta_columns:
+            if fnmatch.fnmatchcase(table.upper(), pattern.upper()):
+                return column
+        return None
+
     def __is_include_exclude_conflict(self):
         """find conflict between --include&--exclude values"""
         if self.include_tables and self.exclude_tables:
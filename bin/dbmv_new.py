@@ -43,7 +43,8 @@ import logging.config
 import json
 
 from conversionParams import ConversionParameters
-from schemaConvertor import SchemaConvertor
+from schemaConvertor import SchemaConvertor, log_dtm_txt
+from runProfiler import RunProfiler
 
 class ErrorFilter(logging.Filter):
     """Filters log messages and decides whether to allow and stop ones"""
@@ -90,7 +91,13 @@ def main():
               'creindex', 'ownsrc=', 'owntgt=', 'add_drop',
               'on_error=', 'source_schema=', 'target_schema=', 'unsupported=', 'exclude=',
               'include=', 'tables=', 'insertmode=', 'trial', 'loadmethod=', 'threads=', 'mapping', '--help',
-              'partition=', 'structure=', 'pagesize=', 'cpvwl', 'vwload' , 'quiet', 'verbose', 'filetag=']
+              'partition=', 'structure=', 'pagesize=', 'cpvwl', 'vwload' , 'quiet', 'verbose', 'filetag=',
+              'executemany', 'parallelism=', 'fifo', 'arraysize=', 'chunks=', 'chunkmethod=',
+              'executor=', 'benchrows=', 'benchwidth=', 'benchtypes=', 'benchpaths=',
+              'refresh-metadata', 'metadata-cache', 'resume', 'delta=', 'deltamode=',
+              'schedule=', 'packsize=', 'progress=', 'profile', 'trace-memory', 'profile-tasks',
+              'commit-every=', 'pipeline=', 'statementsize=',
+              'compress=', 'splitsize=', 'unload-format=', 'row-group=']
 
     parser = argparse.ArgumentParser()
     parser.add_argument('--src', required=False, action="store",
@@ -112,11 +119,36 @@ def main():
     parser.add_argument('--loaddl', required=False, action="store_true",
                         help="load DDL from @source to @dest")
     parser.add_argument('--loadtest', required=False, action="store_true",
-                        help="perform predefined INSERT queries to @dest (used for performance testing)")
+                        help="benchmark the load paths on a synthetic table loaded in @dest (e.g. a local"
+                             " sqlite://localhost/bench.db or postgres) and write rows/s, MB/s and peak RSS as JSON")
+    parser.add_argument('--benchrows', required=False, action="store",
+                        help="--loadtest rows of the synthetic table (default: 10000, max: 10000000)")
+    parser.add_argument('--benchwidth', required=False, action="store",
+                        help="--loadtest columns of the synthetic table (default: 12, min: 2, max: 1000)")
+    parser.add_argument('--benchtypes', required=False, action="store",
+                        help="--loadtest column types taken from test_files/NorthwindExtended.sql, e.g."
+                             " int,nvarchar,datetime (default: all)")
+    parser.add_argument('--benchpaths', required=False, action="store",
+                        help="--loadtest load paths to measure (default: row,multirow,executemany,bulk)")
     parser.add_argument('--batchsize', required=False, action="store",
-                        help="set custom batchsize for INSERT queries (default: 500, min: 1, max: 10000)")
+                        help="set custom batchsize for INSERT queries (default: 500, min: 1, max: 10000), auto:"
+                             " start small and grow or shrink the batches of every table from their insert time,"
+                             " within --statementsize")
+    parser.add_argument('--statementsize', required=False, action="store",
+                        help="--batchsize auto: size budget of an INSERT batch in KB (default: 1024)")
+    parser.add_argument('--pipeline', required=False, action="store",
+                        help="fetch and encode up to this number of batches ahead in a reader thread per table while"
+                             " the previous batches are inserted, so that source and target work at the same time"
+                             " (default: 0, reader and writer alternate, max: 100)")
+    parser.add_argument('--commit-every', required=False, action="store",
+                        help="commit the rows loaded every N rows (e.g. 50000), every N seconds (e.g. 30s) or once per"
+                             " table or --chunks range (table) in an explicit transaction, instead of once per"
+                             " --batchsize batch (ODBC targets, postgres and sqlite)")
     parser.add_argument('--maxrows', required=False, action="store",
                         help="set TOTAL limit for INSERT queries (default: 100000, min: 1, max: 100000)")
+    parser.add_argument('--arraysize', required=False, action="store",
+                        help="rows fetched per round trip when reading table data from @src (default: 1000,"
+                             " min: 1, max: 1000000)")
     parser.add_argument('--truncate', required=False, action="store_true",
                         help="remove existing rows from @dest table")
     parser.add_argument('--parfile', required=False, action="store",
@@ -151,20 +183,40 @@ def main():
     parser.add_argument('--unsupported', required=False, action="store_true",
                         help="whether to skip unsupported types or not")
     parser.add_argument('--exclude', required=False, action="store",
-                        help="exclude specific table/columns from processing")
+                        help="exclude specific table/columns from processing (comma separated table or"
+                             " table.column names, glob patterns such as SALES_* allowed)")
     parser.add_argument('--include', required=False, action="store",
-                        help="include only specific tables/columns for processing")
+                        help="include only specific tables/columns for processing (comma separated table or"
+                             " table.column names, glob patterns such as SALES_* allowed)")
     parser.add_argument('--insertmode', required=False, action="store",
                         help="([default]bulk, row) row - insert data row-by-row, ignoring batchsize, "
                              "bulk - insert data in chunks (buffered insertion)")
     parser.add_argument('--trial', required=False, action="store_true",
                         help="useful for testing (trial) mode", default=False)
     parser.add_argument('--loadmethod', required=False, action="store",
-                        help="use multiple threads for data loading ([default]serial=1, parallel=4,"
+                        help="use multiple threads for data loading and --unload ([default]serial=1, parallel=4,"
                              " multitable=CPU dependent)")
     parser.add_argument('--threads', required=False, action="store",
-                        help="specifies custom number of thread to use (default: 1, min: 1,"
-                             " max: CPU dependent but <= 32)")
+                        help="specifies custom number of thread to use for data loading and --unload (default: 1,"
+                             " min: 1, max: CPU dependent but <= 32)")
+    parser.add_argument('--executor', required=False, action="store",
+                        help="([default]thread, process) run the --threads data loading workers as threads or as"
+                             " processes with their own connections (row conversion not limited by the GIL)")
+    parser.add_argument('--schedule', required=False, action="store",
+                        help="([default]largest, catalog) load the tables largest first, according to the catalog"
+                             " statistics of @src, or in catalog order")
+    parser.add_argument('--packsize', required=False, action="store",
+                        help="--schedule largest: pack the tables smaller than this size (MB) in tasks of up to this"
+                             " size, each one copied by a single thread (default: 0, no packing)")
+    parser.add_argument('--progress', required=False, action="store",
+                        help="seconds between two refreshes of the data load progress (rows, MB/s, ETA) on the"
+                             " console and in the <program>_..._progress.json status file (default: 10, 0: off)")
+    parser.add_argument('--chunks', required=False, action="store",
+                        help="split every table in this number of primary key (or Postgres ctid) ranges loaded"
+                             " by separate threads (default: 1, max: 720)")
+    parser.add_argument('--chunkmethod', required=False, action="store",
+                        help="([default]minmax, ntile) ranges of equal key width (MIN/MAX) or of equal row count"
+                             " (NTILE)")
 
     parser.add_argument('--mapping', required=False, action="store_true",
                         help="Display SRC to DEST variable assignment mapping")
@@ -183,6 +235,55 @@ def main():
 
     parser.add_argument('--cpvwl', required=False, action="store_true",
                         help="Use vwload at SQL level to load CSV files using --cmdsep - COPY tab() VWLOAD FROM 'csvlist <with opts>'")
+    parser.add_argument('--parallelism', required=False, action="store",
+                        help="Parallelism given to the bulk loader of each table with --vwload (default: 1, max: 64)")
+    parser.add_argument('--compress', required=False, action="store",
+                        help="--unload: compress the data files (gzip, zstd or lz4, zstd and lz4 need the python"
+                             " modules zstandard and lz4). A manifest lists the rows and SHA-256 of every file")
+    parser.add_argument('--splitsize', required=False, action="store",
+                        help="--unload, --vwload, --cpvwl: split the data of every table in files of this size"
+                             " (MB, before compression) listed in a manifest, loaded in parallel by the bulk loader"
+                             " (default: 0, one file per table)")
+    parser.add_argument('--unload-format', required=False, action="store",
+                        help="--unload: text (default, delimited lines), parquet or arrow (IPC file): typed columns"
+                             " from the target data types, compressed by the Parquet codec of --compress"
+                             " (default snappy). Needs the python module pyarrow")
+    parser.add_argument('--row-group', required=False, action="store",
+                        help="--unload-format parquet|arrow: rows of a row group / record batch"
+                             " (default: 100000, min: 1000, max: 10000000)")
+    parser.add_argument('--fifo', required=False, action="store_true",
+                        help="With --vwload/--cpvwl stream each table to the loader through a named pipe"
+                             " instead of an intermediate file")
+    parser.add_argument('--executemany', required=False, action="store_true",
+                        help="Load data with one parameterized INSERT per table sent in batches of --batchsize rows"
+                             " (cursor.executemany) instead of literal multi-row VALUES")
+    parser.add_argument('--metadata-cache', required=False, action="store_true",
+                        help="cache the @src catalog queries and reuse them in the next runs. The cache is"
+                             " refreshed when the last DDL time of the source changes or, when the source does not"
+                             " expose one, after an hour")
+    parser.add_argument('--refresh-metadata', required=False, action="store_true",
+                        help="--metadata-cache: query the @src catalog again instead of reusing the metadata cached"
+                             " by a previous run")
+    parser.add_argument('--resume', required=False, action="store_true",
+                        help="loadata: skip the tables (and --chunks ranges) loaded by the previous run and continue"
+                             " the partially loaded ones from their last committed batch")
+    parser.add_argument('--delta', required=False, action="store",
+                        help="loadata: comma separated list of table.column (glob characters allowed in table, e.g."
+                             " *.last_update) giving the watermark column of the tables to copy incrementally."
+                             " The first pass copies the whole table, the next ones only the rows above the"
+                             " high-water mark stored by the previous pass")
+    parser.add_argument('--deltamode', required=False, action="store",
+                        help="([default]upsert, append) --delta: replace the target rows having the primary key"
+                             " of a changed source row or only add the changed rows")
+    parser.add_argument('--profile', required=False, action="store_true",
+                        help="run with cProfile, statistics written to <program>_<filetag>_convert.prof and"
+                             " <program>_<filetag>_convert_profile.txt")
+    parser.add_argument('--trace-memory', required=False, action="store_true",
+                        help="write a memory snapshot of the run to <program>_<filetag>_convert_memory.txt"
+                             " (allocations per line with tracemalloc, objects per type otherwise)")
+    parser.add_argument('--profile-tasks', required=False, action="store_true",
+                        help="--profile/--trace-memory: also profile every table (or --chunks range) loaded,"
+                             " in <program>_<filetag>_task_<table>_... files")
     parser.add_argument('--quiet', required=False, action="store_true",
                         help="No output to console")
     parser.add_argument('--verbose', required=False, action="store_true",
@@ -219,7 +320,14 @@ def main():
     purge(".", params.program_name + '_\w+.txt')
 
     convertor = SchemaConvertor(params)
-    convertor.convert()
+    if params.profile or params.trace_memory:
+        # profiles are named like the other output files of the run
+        profiler = RunProfiler("%s_%s" % (params.program_name, params.filetag or log_dtm_txt),
+                               params.profile, params.trace_memory, params.profile_tasks)
+        convertor.util.profiler = profiler
+        profiler.run('convert', convertor.convert)
+    else:
+        convertor.convert()
 
 
 def set_paths(params):
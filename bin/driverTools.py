@@ -19,11 +19,14 @@
 import re
 import sys
 import os
-import xml.dom.minidom
+import Queue
 import logging
 
 from string import maketrans
 from string import Template
+from threading import Lock
+
+from templateRegistry import get_registry
 
 
 try:
@@ -54,6 +57,7 @@ except ImportError:
 try:
     # Module for Mysql
     import MySQLdb
+    import MySQLdb.cursors
 except ImportError:
     pass
 
@@ -77,6 +81,13 @@ try:
 except ImportError:
     pass
 
+try:
+    import sqlite3                           # Local stand-in database (benchmarks)
+    from decimal import Decimal
+    sqlite3.register_adapter(Decimal, str)   # bound as text like the other drivers do
+except ImportError:
+    pass
+
 
 # Default databases used when no database has been specified in connect string
 defdbs = {"mysql": "mysql", "oracle": "sys", "mssql": "master",
@@ -85,7 +96,7 @@ defdbs = {"mysql": "mysql", "oracle": "sys", "mssql": "master",
           "maxdb": "sysinfo", "ingres": "iidbdb", "vector": "iidbdb",
           "asa": "sys", "iq": "sys", "hana": "sys", "zen": "demodata",
           "matrix": "dev","vectorh": "iidbdb","actianx": "iidbdb","avalanche": "db",
-          "netezza": "nz"
+          "netezza": "nz", "sqlite": "dbmv.db"
           }
 
 # Default port used when no port has been specified in connect string
@@ -95,7 +106,13 @@ defports = {"mysql": "3306", "oracle": "1521", "mssql": "1433",
             "maxdb": "7200", "ingres": "II", "vector": "VW",
             "asa": "2638", "iq": "2638", "hana": "00", "zen": "1531",
             "matrix": "1439", "vectorh": "VH", "actianx": "II", "avalanche": "VW",
-            "netezza": 5480
+            "netezza": 5480, "sqlite": "0"
+            }
+
+# Statement used to check that a connection is still usable
+pingsqls = {"oracle": "SELECT 1 FROM DUAL", "maxdb": "SELECT 1 FROM DUAL",
+            "db2": "SELECT 1 FROM SYSIBM.SYSDUMMY1", "hana": "SELECT 1 FROM DUMMY",
+            "progress": "SELECT 1 FROM SYSPROGRESS.SYSCALCTABLE"
             }
 
 # Error table
@@ -154,19 +171,9 @@ def getDbStringDetails(p_db):
 def getXMLdata(p_key1, p_key2=None, p_key3=None):
     ''' 
         Get Indexed XML data from XML file. 
+        The file is parsed once and again only when it is modified.
     '''
-    result = ""
-    xmldoc = xml.dom.minidom.parse(XMLINI)
-    if (p_key2, p_key3) == (None, None):
-        node = xmldoc.getElementsByTagName(p_key1)[0]
-        result = node.childNodes[0].data
-    else:
-        for node in xmldoc.getElementsByTagName(p_key1)[0].getElementsByTagName(p_key2):
-            if node.getAttribute("id") == p_key3:
-                for child in node.childNodes:
-                    if child.nodeType == xml.dom.minidom.Node.TEXT_NODE:
-                        result = child.data
-    return(result)
+    return(get_registry(XMLINI).get(p_key1, p_key2, p_key3))
 
 
 class dbconnector:
@@ -179,10 +186,18 @@ class dbconnector:
         self.db = None
         self.cursor = None
         self.dbtype = None
+        # DB-API parameter style of the driver (qmark: ?, format: %s, numeric: :1)
+        self.paramstyle = 'qmark'
+        self.driver = None
+        # number of named cursors opened by stream()
+        self.stream_count = 0
+        # explicit transaction opened by begin() instead of autocommit
+        self.transaction = False
         self.logger = logging.getLogger(__name__)
 
         try:
             (self.dbtype, driver, hostname, port, dbname, user, pwd) = getDbStringDetails(db)
+            self.driver = driver
             if (self.dbtype in ["teradata", "maxdb"]) or (driver == "-odbc"):
                 if(self.dbtype == "mssql"):
                     # Azure DB connection
@@ -214,11 +229,13 @@ class dbconnector:
                 self.db = pymssql.connect(
                     host=s, user=user, password=pwd, database=dbname, as_dict=False)
                 self.cursor = self.db.cursor()
+                self.paramstyle = 'format'
     
             elif self.dbtype == "mysql":
                 self.db = MySQLdb.connect(host=hostname, port=int(
                     port), user=user, passwd=pwd, db=dbname)
                 self.cursor = self.db.cursor()
+                self.paramstyle = 'format'
     
             elif self.dbtype == "db2":
                 self.db = DB2.connect(dsn=dbname, uid=user, pwd=pwd)
@@ -231,12 +248,14 @@ class dbconnector:
                 self.db.set_isolation_level(
                     psycopg2.extensions.ISOLATION_LEVEL_AUTOCOMMIT)
                 self.cursor = self.db.cursor()
+                self.paramstyle = 'format'
     
             elif self.dbtype == "oracle":
                 s = "%s/%s@(DESCRIPTION=(ADDRESS=(PROTOCOL=TCP)(HOST=%s)(PORT=%s))(CONNECT_DATA=(SERVICE_NAME=%s)))"
                 s = s % (user, pwd, hostname, port, dbname)
                 self.db = cx_Oracle.connect(s)
                 self.cursor = self.db.cursor()
+                self.paramstyle = 'numeric'
     
             elif self.dbtype == "netezza":
                 # conn="DRIVER={MySQL ODBC 3.51 Driver}; SERVER=localhost; PORT=3306; DATABASE=mysql; UID=joe;
@@ -265,6 +284,11 @@ class dbconnector:
                     self.db = pyodbc.connect(connString, autocommit=True)
                     self.cursor = self.db.cursor()
 
+            elif self.dbtype == "sqlite":
+                # sqlite://localhost/<database file>, in autocommit mode like the other targets
+                self.db = sqlite3.connect(dbname, isolation_level=None, check_same_thread=False)
+                self.cursor = self.db.cursor()
+
             elif self.dbtype in ["ingres", "vector", "vectorh", "actianx", "avalanche"]:
                 connString = "DRIVER={Ingres};SERVER=@%s,tcp_ip,%s;DATABASE=%s;SERVERTYPE=INGRES;UID=%s;PWD=%s;" % (
                     hostname, port, dbname, user, pwd)
@@ -304,13 +328,154 @@ class dbconnector:
 
         return(rows)
 
+    # Stream the result of a SELECT statement
+    # ---------------------------------------------------------
+    def stream(self, p_sql, p_arraysize=1000):
+        '''
+            Iterate over the rows of p_sql fetching p_arraysize rows at a time, so that
+            memory stays bounded whatever the size of the table.
+            Postgres/Greenplum use a named (server side) cursor, MySQL an unbuffered one
+            and Oracle prefetches p_arraysize rows per round trip.
+            Errors are raised to the caller.
+        '''
+        # a named cursor only lives in a transaction: one is opened for the stream when the
+        # connection is in autocommit mode (a WITH HOLD cursor would materialize the whole result)
+        began = self.named_stream() and not self.transaction and self.begin()
+        cursor = self.stream_cursor(p_arraysize)
+        try:
+            cursor.execute(p_sql)
+            while True:
+                rows = cursor.fetchmany(p_arraysize)
+                if not rows:
+                    break
+                for row in rows:
+                    yield row
+        finally:
+            if cursor is not self.cursor:
+                cursor.close()
+            if began:
+                self.end()
+
+    def named_stream(self):
+        '''
+            Return True when stream() reads through a named (server side) cursor
+        '''
+        return self.db is not None and self.dbtype in ["postgres", "greenplum"] and self.driver is None
+
+    def stream_cursor(self, p_arraysize):
+        '''
+            Open the cursor used by stream()
+        '''
+        if self.db is None:
+            cursor = self.cursor
+        elif self.named_stream():
+            self.stream_count += 1
+            cursor = self.db.cursor(name="dbmv_stream_%d" % self.stream_count, withhold=False)
+            cursor.itersize = p_arraysize
+        elif self.dbtype == "mysql" and self.driver is None:
+            cursor = self.db.cursor(MySQLdb.cursors.SSCursor)
+        else:
+            cursor = self.db.cursor()
+        if hasattr(cursor, 'arraysize'):
+            cursor.arraysize = p_arraysize
+        if hasattr(cursor, 'prefetchrows'):
+            # cx_Oracle >= 8
+            cursor.prefetchrows = p_arraysize
+        return cursor
+
+    # Execute a parameterized statement for a batch of rows
+    # ---------------------------------------------------------
+    def executemany(self, p_sql, p_rows):
+        '''
+            Bind every row of p_rows to p_sql and send them in one call.
+            Errors are raised to the caller (see ConvertorUtil.insert_many)
+        '''
+        if hasattr(self.cursor, 'fast_executemany'):
+            # pyodbc >= 4.0.19: ship the whole parameter array in a single round trip
+            self.cursor.fast_executemany = True
+        self.cursor.executemany(p_sql, p_rows)
+
+    def param_marker(self, p_position):
+        '''
+            Return the bind marker of the p_position (0 based) parameter for this driver
+        '''
+        if self.paramstyle == 'format':
+            return '%s'
+        elif self.paramstyle == 'numeric':
+            return ':%d' % (p_position + 1)
+        return '?'
+
+    def ping(self):
+        '''
+            Return True if the connection still answers a trivial query
+        '''
+        if self.cursor is None:
+            return False
+        try:
+            self.cursor.execute(pingsqls.get(self.dbtype, "SELECT 1"))
+            self.cursor.fetchall()
+            return True
+        except Exception:
+            return False
+
     def commit(self):
-        if self.dbtype in ["db2"]:
+        if self.transaction:
+            self.db.commit()
+            if self.dbtype == "sqlite":
+                self.cursor.execute("BEGIN")
+
+        elif self.dbtype in ["db2"]:
             self.cursor.execute("commit")
 
         elif self.dbtype in ["asa", "iq"]:
             self.db.commit()
 
+    def begin(self):
+        '''
+            Leave autocommit mode: the next statements are committed together by commit() until end().
+            Return False when the connection of this dbtype can't leave autocommit.
+        '''
+        if self.db is None or self.transaction:
+            return self.transaction
+        if self.dbtype == "sqlite":
+            self.cursor.execute("BEGIN")
+        elif self.dbtype in ["postgres", "greenplum"] and self.driver is None:
+            self.db.set_isolation_level(psycopg2.extensions.ISOLATION_LEVEL_READ_COMMITTED)
+        elif self.dbtype in ["ingres", "vector", "vectorh", "actianx", "avalanche", "zen", "progress", "teradata",
+                             "maxdb"] or \
+                (self.driver == "-odbc" and self.dbtype != "mssql"):
+            # pyodbc connections are opened with autocommit=True
+            self.db.autocommit = False
+        else:
+            return False
+        self.transaction = True
+        return True
+
+    def rollback(self):
+        '''
+            Roll back the statements run since the last commit() of the transaction opened by begin()
+        '''
+        if self.transaction:
+            self.db.rollback()
+            if self.dbtype == "sqlite":
+                self.cursor.execute("BEGIN")
+
+    def end(self, p_commit=True):
+        '''
+            Commit (or roll back) the transaction opened by begin() and go back to autocommit mode
+        '''
+        if not self.transaction:
+            return
+        self.transaction = False
+        if p_commit:
+            self.db.commit()
+        else:
+            self.db.rollback()
+        if self.dbtype in ["postgres", "greenplum"] and self.driver is None:
+            self.db.set_isolation_level(psycopg2.extensions.ISOLATION_LEVEL_AUTOCOMMIT)
+        elif self.dbtype != "sqlite":
+            self.db.autocommit = True
+
     def close(self):
         if self.db is None or self.dbtype in ["netezza", "teradata", "maxdb", "progress"]:
             pass
@@ -350,3 +515,82 @@ class dbconnector:
 
     def __exit__(self, exc_type, exc_val, exc_tb):
         self.close()
+
+
+class ConnectorPool:
+    def __init__(self, p_src, p_dest, p_size, p_first=None, p_connect_dest=True):
+        '''
+            Bounded pool of [source dbconnector, target dbconnector, index] pairs.
+            Pairs are opened on demand up to p_size; p_first is an already opened
+            (source, target) pair used as pair #0 and left open by close().
+            p_connect_dest False: the target is not connected (e.g. --unload only reads the source).
+        '''
+        self.src = p_src
+        self.dest = p_dest
+        self.size = p_size
+        self.first = p_first
+        self.connect_dest = p_connect_dest
+        self.pairs = []
+        self.idle = Queue.Queue()
+        self.lock = Lock()
+        self.logger = logging.getLogger(__name__)
+        if p_first is not None:
+            self.pairs.append([p_first[0], p_first[1], 0])
+            self.idle.put(self.pairs[0])
+
+    def checkout(self):
+        '''
+            Get a healthy pair, opening a new one while the pool is not full,
+            otherwise waiting for a pair to be checked in
+        '''
+        pair = None
+        try:
+            pair = self.idle.get_nowait()
+        except Queue.Empty:
+            with self.lock:
+                if len(self.pairs) < self.size:
+                    pair = [dbconnector(self.src, True), dbconnector(self.dest, self.connect_dest), len(self.pairs)]
+                    self.pairs.append(pair)
+            if pair is None:
+                pair = self.idle.get()
+        return self.check(pair)
+
+    def checkin(self, p_pair):
+        self.idle.put(p_pair)
+
+    def primary(self):
+        '''
+            Healthy pair #0, used by the serial (metadata) phases while no worker runs
+        '''
+        if not self.pairs:
+            self.checkin(self.checkout())
+        return self.check(self.pairs[0])
+
+    def check(self, p_pair):
+        '''
+            Reconnect the connectors of p_pair that do not answer anymore
+        '''
+        for (position, url) in ((0, self.src), (1, self.dest)):
+            connector = p_pair[position]
+            if connector.cursor is not None and not connector.ping():
+                self.logger.warn("Connection #%d to %s lost. Reconnecting..." % (p_pair[2], connector.dbtype))
+                try:
+                    connector.close()
+                except Exception:
+                    pass
+                p_pair[position] = dbconnector(url, True)
+        return p_pair
+
+    def close(self):
+        '''
+            Close the connectors opened by the pool (p_first ones are left to their owner)
+        '''
+        for pair in self.pairs:
+            for connector in pair[:2]:
+                if self.first is None or connector not in self.first:
+                    connector.close()
+        self.pairs = []
+        self.idle = Queue.Queue()
+        if self.first is not None:
+            self.pairs.append([self.first[0], self.first[1], 0])
+            self.idle.put(self.pairs[0])
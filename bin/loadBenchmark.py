@@ -0,0 +1,384 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*
+
+# Copyright 2020 Actian Corporation
+
+#    Licensed under the Apache License, Version 2.0 (the "License");
+#    you may not use this file except in compliance with the License.
+#    You may obtain a copy of the License at
+
+#      http://www.apache.org/licenses/LICENSE-2.0
+
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS,
+#    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#    See the License for the specific language governing permissions and
+#    limitations under the License.
+
+import codecs
+import os
+import re
+import time
+import random
+import logging
+import resource
+import multiprocessing
+from datetime import datetime, timedelta
+from decimal import Decimal
+from string import Template
+
+from driverTools import dbconnector, getDbStringDetails, ConnectorPool
+from loadProgress import Counter
+
+# Load paths measured by the benchmark, in run order
+bench_paths = ['row', 'multirow', 'executemany', 'bulk']
+
+# Seed (SQL Server) type -> (generic target type, value kind)
+seed_types = {'int': ('INTEGER', 'int'), 'bigint': ('BIGINT', 'bigint'), 'smallint': ('SMALLINT', 'smallint'),
+              'tinyint': ('SMALLINT', 'tinyint'), 'bit': ('SMALLINT', 'bit'),
+              'money': ('DECIMAL(19,4)', 'decimal'), 'smallmoney': ('DECIMAL(10,4)', 'decimal'),
+              'decimal': ('DECIMAL(18,4)', 'decimal'), 'numeric': ('DECIMAL(18,4)', 'decimal'),
+              'real': ('FLOAT', 'float'), 'float': ('FLOAT', 'float'),
+              'datetime': ('TIMESTAMP', 'datetime'), 'smalldatetime': ('TIMESTAMP', 'datetime'),
+              'nvarchar': ('VARCHAR(%d)', 'str'), 'varchar': ('VARCHAR(%d)', 'str'),
+              'nchar': ('VARCHAR(%d)', 'str'), 'char': ('VARCHAR(%d)', 'str'),
+              'ntext': ('VARCHAR(%d)', 'text'), 'text': ('VARCHAR(%d)', 'text'), 'xml': ('VARCHAR(%d)', 'text')
+              }
+
+# Value kinds written without quotes in INSERT statements (as the numeric types_mapping insert casts)
+numeric_kinds = ('int', 'bigint', 'smallint', 'tinyint', 'bit', 'decimal', 'float')
+
+# Longest character column of the synthetic tables (MAX, ntext, xml)
+text_length = 4000
+
+# Characters of the generated strings, the quote checks the escaping of the literal paths
+alphabet = u"abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789 '"
+
+column_pattern = re.compile(r"^\s*\[([^\]]+)\]\s+\[(\w+)\](?:\(([^)]*)\))?.*?\b(NOT NULL|NULL)\b")
+
+
+def read_seed_columns(seed_path):
+    """
+        Columns of the CREATE TABLE statements of a SQL Server script (e.g. test_files/NorthwindExtended.sql)
+        @:param seed_path script, UTF-16 or UTF-8 encoded
+        @:return: list of (column name, seed type, length, nullable) for the types the benchmark can generate
+    """
+    with open(seed_path, 'rb') as f:
+        data = f.read()
+    if data[:2] in (codecs.BOM_UTF16_LE, codecs.BOM_UTF16_BE):
+        text = data.decode('utf-16')
+    else:
+        text = data.decode('utf-8', 'ignore')
+
+    columns = []
+    in_table = False
+    for line in text.splitlines():
+        if line.startswith('CREATE TABLE'):
+            in_table = True
+        elif line.startswith(')'):
+            in_table = False
+        elif in_table:
+            match = column_pattern.match(line)
+            if match is not None and match.group(2).lower() in seed_types:
+                (name, seed_type, length, nullable) = match.groups()
+                length = int(length) if length is not None and length.isdigit() else text_length
+                columns.append((name, seed_type.lower(), min(length, text_length), nullable == 'NULL'))
+    return columns
+
+
+def peak_rss():
+    """
+        Peak resident set size of the process in KB (Linux getrusage unit), since its start: a forked
+        process starts from the RSS of its parent
+    """
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+class SyntheticTable(object):
+    """
+        Table of a given width built from the seed columns and its generated rows.
+        Column 0 is the row number, the other ones cycle over the seed columns taking one of each type in turn.
+    """
+
+    def __init__(self, name, seed_columns, width, rows, seed=0):
+        self.name = name
+        self.rng = random.Random(seed)
+        by_type = {}
+        for column in seed_columns:
+            by_type.setdefault(column[1], []).append(column)
+        rotation = []
+        for i in range(max(len(c) for c in by_type.values())):
+            rotation += [by_type[t][i] for t in sorted(by_type) if i < len(by_type[t])]
+        self.columns = [('ID', 'int', 0, False)]
+        for i in range(1, width):
+            (colname, seed_type, length, nullable) = rotation[(i - 1) % len(rotation)]
+            self.columns.append(('C%d_%s' % (i, re.sub(r'\W', '', colname)[:20]), seed_type, length, nullable))
+        self.rows = [self.generate_row(i) for i in range(rows)]
+
+    def ddl(self, target_table):
+        """
+            CREATE TABLE statement of the table with generic types
+        """
+        definitions = []
+        for (name, seed_type, length, nullable) in self.columns:
+            target_type = seed_types[seed_type][0]
+            if '%d' in target_type:
+                target_type = target_type % max(length, 1)
+            definitions.append('%s %s%s' % (name, target_type, '' if nullable else ' NOT NULL'))
+        return 'CREATE TABLE %s (%s)' % (target_table, ', '.join(definitions))
+
+    def layout(self, separator):
+        """
+            <Vn> placeholders of a row, quoted for character and date values (see RowEncoder)
+        """
+        placeholders = []
+        for (i, (name, seed_type, length, nullable)) in enumerate(self.columns):
+            if seed_types[seed_type][1] in numeric_kinds:
+                placeholders.append('<V%d>' % i)
+            else:
+                placeholders.append("'<V%d>'" % i)
+        return separator.join(placeholders)
+
+    def generate_row(self, number):
+        row = [number]
+        for (name, seed_type, length, nullable) in self.columns[1:]:
+            row.append(self.generate_value(seed_types[seed_type][1], length, nullable))
+        return row
+
+    def generate_value(self, kind, length, nullable):
+        rng = self.rng
+        if nullable and rng.random() < 0.1:
+            return None
+        if kind == 'int':
+            return rng.randint(-2147483648, 2147483647)
+        elif kind == 'bigint':
+            return rng.randint(-9223372036854775808, 9223372036854775807)
+        elif kind == 'smallint':
+            return rng.randint(-32768, 32767)
+        elif kind == 'tinyint':
+            return rng.randint(0, 255)
+        elif kind == 'bit':
+            return rng.randint(0, 1)
+        elif kind == 'decimal':
+            return Decimal('%d.%04d' % (rng.randint(-99999999, 99999999), rng.randint(0, 9999)))
+        elif kind == 'float':
+            return rng.uniform(-1e6, 1e6)
+        elif kind == 'datetime':
+            return datetime(2000, 1, 1) + timedelta(seconds=rng.randint(0, 20 * 365 * 86400))
+        size = rng.randint(1, min(length, 200 if kind == 'text' else 40))
+        return u''.join(rng.choice(alphabet) for _ in range(size))
+
+
+class RowSource(object):
+    """
+        Source connector of the benchmark tasks: the rows of the synthetic table, so that the load paths
+        measure copy_table_data and write_table_file as they run in a load, without a source database
+    """
+    dbtype = 'synthetic'
+    # no connection for ConnectorPool.check() to ping
+    cursor = None
+
+    def __init__(self, rows):
+        self.rows = rows
+
+    def stream(self, p_sql, p_arraysize=1000):
+        for row in self.rows:
+            yield row
+
+    def close(self):
+        pass
+
+
+class LoadBenchmark:
+    """
+        Load the rows of a synthetic table in the target database through every load path
+        of dbmv and measure rows/s, MB/s and peak RSS. Every path runs copy_table_data (or
+        write_table_file and the bulk loader) in a process of its own, forked once the rows are
+        generated: its peak RSS is not the one of the previous paths and the growth over the RSS
+        at the fork is the memory of the path itself.
+    """
+
+    def __init__(self, util, target_connector):
+        """
+            @:param util ConvertorUtil giving copy_table_data/write_table_file and the parameters
+            @:param target_connector stand-in target database (e.g. sqlite://localhost/bench.db, local postgres)
+        """
+        self.util = util
+        self.params = util.params
+        self.connector = target_connector
+        self.logger = logging.getLogger(__name__)
+
+    def run(self, seed_path):
+        """
+            Run the selected load paths and return the results as a JSON serializable dict
+        """
+        from schemaConvertor import RowEncoder
+
+        seed_columns = read_seed_columns(seed_path)
+        if self.params.bench_types:
+            seed_columns = [c for c in seed_columns if c[1] in self.params.bench_types]
+        if not seed_columns:
+            raise ValueError("No seed columns of types %s in %s" % (self.params.bench_types, seed_path))
+
+        t1 = time.time()
+        table = SyntheticTable('dbmv_bench', seed_columns, self.params.bench_width, self.params.bench_rows)
+        target_table = table.name if self.params.target_schema is None else \
+            self.util.quote(self.params.target_schema) + '.' + table.name
+        # every path loads the same data: its size is the one of the unload file
+        line_encoder = RowEncoder(table.layout(self.params.fdelim), '')
+        data_size = sum(len(line_encoder.encode(row)) + 1 for row in table.rows)
+        self.logger.info("Benchmark table %s: %d columns, %d rows, %f MB generated in %f s" % (
+            target_table, len(table.columns), len(table.rows), data_size / 1024.0 / 1024, time.time() - t1))
+
+        result = {'target': self.connector.dbtype, 'table': target_table, 'columns': len(table.columns),
+                  'types': sorted(set(c[1] for c in table.columns)), 'rows': len(table.rows),
+                  'data_mb': data_size / 1024.0 / 1024, 'batchsize': self.params.batchsize,
+                  'seed': os.path.basename(seed_path), 'paths': []}
+
+        created = False
+        for path in self.params.bench_paths:
+            if path == 'bulk' and self.bulk_loader() == '' and self.connector.dbtype not in ["postgres", "greenplum"]:
+                self.logger.warn("No bulk loader for %s targets, the bulk path is skipped" % self.connector.dbtype)
+                continue
+            if created:
+                self.connector.execute('DROP TABLE %s' % target_table)
+            self.connector.execute(table.ddl(target_table))
+            created = True
+            self.connector.commit()
+
+            (loaded, elapsed, peak_kb, growth_kb) = self.run_path(path, table, target_table)
+
+            rows_loaded = -1
+            cur = self.connector.execute('SELECT COUNT(*) FROM ' + target_table)
+            if cur is not None:
+                for line in cur:
+                    rows_loaded = line[0]
+            if loaded is None:
+                # rows reported by the target, the bulk loader does not return them
+                loaded = rows_loaded
+            measure = {'path': path, 'rows': len(table.rows), 'loaded': loaded,
+                       'verified': rows_loaded == len(table.rows), 'seconds': elapsed,
+                       'rows_per_s': len(table.rows) / elapsed if elapsed > 0 else None,
+                       'mb_per_s': data_size / 1024.0 / 1024 / elapsed if elapsed > 0 else None,
+                       'peak_rss_kb': peak_kb, 'rss_growth_kb': growth_kb}
+            self.logger.info("Benchmark %s: %d rows in %f s - %s rows/s - %s MB/s - peak RSS %d KB (+%d KB)" % (
+                path, len(table.rows), elapsed, measure['rows_per_s'], measure['mb_per_s'], peak_kb, growth_kb))
+            result['paths'].append(measure)
+
+        if created:
+            self.connector.execute('DROP TABLE %s' % target_table)
+            self.connector.commit()
+        return result
+
+    def run_path(self, path, table, target_table):
+        """
+            Run a load path in a forked process
+            @:return: (rows loaded or None, seconds, peak RSS KB, RSS growth KB) of the path
+        """
+        (reader, writer) = multiprocessing.Pipe(False)
+        child = multiprocessing.Process(target=self.measure_path, args=(path, table, target_table, writer))
+        child.start()
+        writer.close()
+        try:
+            measure = reader.recv()
+        except EOFError:
+            measure = None
+        child.join()
+        if measure is None:
+            raise RuntimeError("Benchmark %s path failed (exit code %s)" % (path, child.exitcode))
+        return measure
+
+    def measure_path(self, path, table, target_table, writer):
+        """
+            Forked process of run_path(): load the table on a target connection of its own and send the measure
+        """
+        baseline = peak_rss()
+        # the connection of the parent is left to it
+        self.connector = dbconnector(self.params.dest, True)
+        self.util.pool = ConnectorPool(None, self.params.dest, 1, (RowSource(table.rows), self.connector))
+        self.util.inserted_queries_number = Counter()
+        (self.util.journal, self.util.progress) = (None, None)
+        t1 = time.time()
+        try:
+            loaded = getattr(self, 'load_' + path)(table, target_table)
+        except SystemExit:
+            # handle_error() exits on error
+            loaded = -1
+        elapsed = time.time() - t1
+        self.connector.close()
+        writer.send((loaded, elapsed, peak_rss(), peak_rss() - baseline))
+        writer.close()
+
+    def copy_rows(self, table, target_table, insert):
+        """
+            @:return: rows loaded by copy_table_data, -1 when it failed
+        """
+        result = self.util.copy_table_data(target_table, len(table.columns), 'SELECT * FROM %s' % table.name,
+                                           insert, False)
+        return result[1] if isinstance(result, tuple) else -1
+
+    def load_row(self, table, target_table):
+        """
+            One INSERT statement per row: copy_table_data with batches of a single row
+        """
+        (self.params.batchsize, self.params.batch_adaptive) = (1, False)
+        return self.load_multirow(table, target_table)
+
+    def load_multirow(self, table, target_table):
+        """
+            Multi-row VALUES statements of --batchsize rows (default load path)
+        """
+        self.params.executemany = False
+        return self.copy_rows(table, target_table, 'INSERT INTO %s VALUES (%s)' % (target_table, table.layout(',')))
+
+    def load_executemany(self, table, target_table):
+        """
+            Parameterized INSERT bound to batches of --batchsize rows (--executemany)
+        """
+        self.params.executemany = True
+        return self.copy_rows(table, target_table, 'INSERT INTO %s VALUES (%s)' % (
+            target_table, ','.join(self.connector.param_marker(i) for i in range(len(table.columns)))))
+
+    def bulk_loader(self):
+        """
+            @:return: cpvwl load definition of the target, '' when it has none
+        """
+        try:
+            return self.util.get_xml_data(dbtype=self.connector.dbtype, sql="load", identifier="cpvwl").strip()
+        except IndexError:
+            # no definitions for this target type
+            return ''
+
+    def load_bulk(self, table, target_table):
+        """
+            Write a delimited file with write_table_file, as unload_data does, and hand it to the bulk loader
+            of the target: COPY VWLOAD (cpvwl definition of the target) or COPY FROM STDIN for
+            Postgres/Greenplum. The other targets (e.g. SQLite) have no bulk path: run() skips it.
+            @:return: None, the loaded rows are counted on the target
+        """
+        fname = os.path.abspath('%s_%s_bench.txt' % (self.params.program_name, self.connector.dbtype))
+        try:
+            if self.util.write_table_file(RowSource(table.rows), fname, len(table.columns),
+                                          'SELECT * FROM %s' % table.name, table.layout(self.params.fdelim)) < 0:
+                raise IOError("Benchmark rows not written to %s" % fname)
+            loader = self.bulk_loader()
+            if loader != '':
+                # unqualified tables are created in the schema of the user
+                scname = self.params.target_schema or getDbStringDetails(self.params.dest)[5]
+                cmd = Template(loader).substitute(scname=scname, tbname=table.name,
+                                                  fdelim=self.params.fdelim, fname=fname, dbname='',
+                                                  attrib="ERROR_COUNT=1", attribsep=',', wdname=os.getcwd())
+                for stmt in cmd.split(';'):
+                    if stmt.strip() != "":
+                        self.connector.execute(stmt)
+                self.connector.commit()
+            else:
+                # same file format as the VWLOAD one: quote ', empty unquoted value is NULL
+                with open(fname, 'rb') as f:
+                    self.connector.cursor.copy_expert(
+                        "COPY %s FROM STDIN WITH (FORMAT csv, DELIMITER '%s', QUOTE '''', NULL '')" % (
+                            target_table, self.params.fdelim), f)
+            return None
+        finally:
+            if os.path.exists(fname):
+                os.remove(fname)
@@ -0,0 +1,142 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*
+
+# Copyright 2020 Actian Corporation
+
+#    Licensed under the Apache License, Version 2.0 (the "License");
+#    you may not use this file except in compliance with the License.
+#    You may obtain a copy of the License at
+
+#      http://www.apache.org/licenses/LICENSE-2.0
+
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS,
+#    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#    See the License for the specific language governing permissions and
+#    limitations under the License.
+
+import os
+import time
+import logging
+import sqlite3
+from threading import Lock
+
+
+class LoadJournal:
+    """
+        Checkpoint journal of load_data in a local SQLite file. A task is a table, or a key range
+        of a table split with --chunks (chunk is then its WHERE clause). For every task the journal
+        keeps its state (running/done/failed), the rows committed so far and the last committed key.
+        A failed task lost rows (--on_error continue): it is loaded again like a running one.
+        With --delta the journal also keeps the high-water mark of every table: the stored one, up to
+        which the target holds the source rows, and the pending one of the pass in progress.
+        The key ranges of a split table are kept too, so that a resumed run reuses them.
+        Written by the loading threads and processes (one connection per process).
+    """
+
+    def __init__(self, fname):
+        self.fname = fname
+        self.logger = logging.getLogger(__name__)
+        self.lock = Lock()
+        self.db = None
+        self.pid = None
+
+    def connection(self):
+        if self.db is None or self.pid != os.getpid():
+            # a forked worker opens its own connection
+            self.db = sqlite3.connect(self.fname, timeout=60, isolation_level=None, check_same_thread=False)
+            self.db.execute("PRAGMA journal_mode=WAL")
+            self.db.execute("CREATE TABLE IF NOT EXISTS checkpoint (table_name TEXT, chunk TEXT, state TEXT,"
+                            " rows INTEGER, last_key TEXT, updated REAL, PRIMARY KEY (table_name, chunk))")
+            self.db.execute("CREATE TABLE IF NOT EXISTS watermark (table_name TEXT, state TEXT, column_name TEXT,"
+                            " kind TEXT, value TEXT, updated REAL, PRIMARY KEY (table_name, state))")
+            self.db.execute("CREATE TABLE IF NOT EXISTS ranges (table_name TEXT, position INTEGER, key TEXT,"
+                            " chunks INTEGER, clause TEXT, PRIMARY KEY (table_name, position))")
+            self.pid = os.getpid()
+        return self.db
+
+    def execute(self, sql, values=()):
+        with self.lock:
+            return self.connection().execute(sql, values).fetchall()
+
+    def reset(self):
+        """
+            Forget the checkpoints, key ranges and pending high-water marks of a previous run
+        """
+        self.execute("DELETE FROM checkpoint")
+        self.execute("DELETE FROM ranges")
+        self.execute("DELETE FROM watermark WHERE state = 'pending'")
+
+    def get(self, table_name, chunk=''):
+        """
+            @:return: (state, rows, last_key) of the task or None when it never started
+        """
+        rows = self.execute("SELECT state, rows, last_key FROM checkpoint WHERE table_name = ? AND chunk = ?",
+                            (table_name, chunk))
+        return tuple(rows[0]) if rows else None
+
+    def start(self, table_name, chunk=''):
+        self.execute("INSERT OR REPLACE INTO checkpoint VALUES (?, ?, 'running', 0, NULL, ?)",
+                     (table_name, chunk, time.time()))
+
+    def progress(self, table_name, chunk, rows, last_key=None):
+        """
+            Record a committed batch: rows committed by the task so far and key of its last row
+        """
+        self.execute("UPDATE checkpoint SET rows = ?, last_key = ?, updated = ? WHERE table_name = ? AND chunk = ?",
+                     (rows, None if last_key is None else str(last_key), time.time(), table_name, chunk))
+
+    def fail(self, table_name, chunk, rows, last_key=None):
+        """
+            Record a task over with rows that failed to load: rows and key of its last commit before them
+        """
+        self.execute("UPDATE checkpoint SET state = 'failed', rows = ?, last_key = ?, updated = ?"
+                     " WHERE table_name = ? AND chunk = ?",
+                     (rows, None if last_key is None else str(last_key), time.time(), table_name, chunk))
+
+    def done(self, table_name, chunk, rows):
+        self.execute("UPDATE checkpoint SET state = 'done', rows = ?, updated = ? WHERE table_name = ? AND chunk = ?",
+                     (rows, time.time(), table_name, chunk))
+
+    def forget(self, table_name):
+        """
+            Drop the checkpoints and key ranges of every task of a table (reloaded from scratch)
+        """
+        self.execute("DELETE FROM checkpoint WHERE table_name = ?", (table_name,))
+        self.execute("DELETE FROM ranges WHERE table_name = ?", (table_name,))
+
+    def ranges(self, table_name):
+        """
+            @:return: (key, --chunks, [WHERE clauses]) of the split of the table or None
+        """
+        rows = self.execute("SELECT key, chunks, clause FROM ranges WHERE table_name = ? ORDER BY position",
+                            (table_name,))
+        return (rows[0][0], rows[0][1], [row[2] for row in rows]) if rows else None
+
+    def set_ranges(self, table_name, key, chunks, ranges):
+        self.execute("DELETE FROM ranges WHERE table_name = ?", (table_name,))
+        for (position, clause) in enumerate(ranges):
+            self.execute("INSERT INTO ranges VALUES (?, ?, ?, ?, ?)", (table_name, position, key, chunks, clause))
+
+    def watermark(self, table_name, state='stored'):
+        """
+            @:return: (column_name, kind, value) of the high-water mark of the table or None
+        """
+        rows = self.execute("SELECT column_name, kind, value FROM watermark WHERE table_name = ? AND state = ?",
+                            (table_name, state))
+        return tuple(rows[0]) if rows else None
+
+    def set_watermark(self, table_name, column_name, kind, value, state='stored'):
+        self.execute("INSERT OR REPLACE INTO watermark VALUES (?, ?, ?, ?, ?, ?)",
+                     (table_name, state, column_name, kind, value, time.time()))
+
+    def commit_watermark(self, table_name):
+        """
+            The pass in progress is loaded: its high-water mark becomes the stored one
+        """
+        self.execute("INSERT OR REPLACE INTO watermark SELECT table_name, 'stored', column_name, kind, value, ?"
+                     " FROM watermark WHERE table_name = ? AND state = 'pending'", (time.time(), table_name))
+        self.execute("DELETE FROM watermark WHERE table_name = ? AND state = 'pending'", (table_name,))
+
+    def forget_watermark(self, table_name):
+        self.execute("DELETE FROM watermark WHERE table_name = ?", (table_name,))
@@ -0,0 +1,177 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*
+
+# Copyright 2020 Actian Corporation
+
+#    Licensed under the Apache License, Version 2.0 (the "License");
+#    you may not use this file except in compliance with the License.
+#    You may obtain a copy of the License at
+
+#      http://www.apache.org/licenses/LICENSE-2.0
+
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS,
+#    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#    See the License for the specific language governing permissions and
+#    limitations under the License.
+
+import os
+import sys
+import json
+import time
+import logging
+from collections import OrderedDict
+from datetime import datetime
+from multiprocessing import Value
+from threading import Thread, Event
+
+
+class Counter(object):
+    def __init__(self, value=0, typecode='i'):
+        # Shared memory value and its process safe lock, so that the counter
+        # is also shared by the workers of --executor process
+        self.val = Value(typecode, value)
+        self.lock = self.val.get_lock()
+
+    def add(self, value):
+        with self.lock:
+            self.val.value += value
+
+    def get(self):
+        with self.lock:
+            return self.val.value
+
+
+class LoadProgress:
+    """
+        Progress of load_data: rows and bytes committed per table (fed by copy_table_data after every
+        batch) against the rows estimated from the catalog statistics, overall rows/s and MB/s and the
+        ETA of the tables with an estimate. Every interval seconds a reporter thread of the main process
+        refreshes a console line (when stderr is a terminal) and rewrites the status file as JSON.
+        The counters are Counters so that the workers of --executor process update them too: the tables
+        must be added before the pool is forked.
+    """
+
+    def __init__(self, fname, interval):
+        """
+            @:param fname status file
+            @:param interval seconds between two reports
+        """
+        self.fname = fname
+        self.interval = interval
+        self.logger = logging.getLogger(__name__)
+        self.console = sys.stderr.isatty()
+        # table -> (estimated rows or None, rows, bytes, tasks left)
+        self.tables = OrderedDict()
+        self.started = None
+        self.stopped = Event()
+        self.reporter = None
+
+    def add_table(self, table_name, tasks, estimated_rows=None):
+        """
+            @:param tasks number of copy_table_data tasks of the table
+            @:param estimated_rows rows expected from the catalog statistics, None when unknown
+        """
+        self.tables[table_name] = (estimated_rows, Counter(0, 'd'), Counter(0, 'd'), Counter(tasks))
+
+    def update(self, table_name, rows, size):
+        """
+            Account a committed batch of a table
+            @:param rows rows of the batch
+            @:param size estimated bytes of the batch
+        """
+        table = self.tables.get(table_name)
+        if table is not None:
+            table[1].add(rows)
+            table[2].add(size)
+
+    def finish(self, table_name):
+        """
+            A task of the table is over
+        """
+        table = self.tables.get(table_name)
+        if table is not None:
+            table[3].add(-1)
+
+    def start(self):
+        self.started = time.time()
+        self.stopped.clear()
+        if self.interval > 0:
+            self.reporter = Thread(target=self.run)
+            self.reporter.daemon = True
+            self.reporter.start()
+
+    def stop(self):
+        self.stopped.set()
+        if self.reporter is not None:
+            self.reporter.join()
+            self.reporter = None
+        if self.interval > 0:
+            self.report(True)
+
+    def run(self):
+        while not self.stopped.wait(self.interval):
+            try:
+                self.report(False)
+            except Exception as ex:
+                self.logger.warn("Progress not reported: %s" % ex)
+
+    def status(self, final=False):
+        """
+            @:return: progress of the load as a dict (content of the status file)
+        """
+        now = time.time()
+        elapsed = max(now - (self.started or now), 0.001)
+        tables = OrderedDict()
+        (rows, size, estimated, remaining, tables_done) = (0, 0.0, 0, 0, 0)
+        for (table_name, (estimated_rows, table_rows, table_size, tasks)) in self.tables.items():
+            table = {'rows': int(table_rows.get()), 'mb': round(table_size.get() / 1024 / 1024, 3),
+                     'rows_estimated': estimated_rows, 'done': tasks.get() <= 0}
+            tables[table_name] = table
+            rows += table['rows']
+            size += table_size.get()
+            if table['done']:
+                tables_done += 1
+            if estimated_rows is not None:
+                estimated += max(estimated_rows, table['rows'])
+                if not table['done']:
+                    remaining += max(estimated_rows - table['rows'], 0)
+        rows_per_s = rows / elapsed
+        result = OrderedDict()
+        result['state'] = 'done' if final else 'running'
+        result['started'] = datetime.fromtimestamp(self.started or now).isoformat()
+        result['updated'] = datetime.fromtimestamp(now).isoformat()
+        result['elapsed_s'] = round(elapsed, 1)
+        result['tables_total'] = len(self.tables)
+        result['tables_done'] = tables_done
+        result['rows'] = rows
+        result['rows_estimated'] = estimated
+        result['percent'] = round(100.0 * (estimated - remaining) / estimated, 1) if estimated else None
+        result['rows_per_s'] = round(rows_per_s, 1)
+        result['mb_per_s'] = round(size / 1024 / 1024 / elapsed, 3)
+        # tables without estimate are not part of the ETA
+        result['eta_s'] = 0 if final else round(remaining / rows_per_s) if rows_per_s > 0 and estimated else None
+        result['tables'] = tables
+        return result
+
+    def report(self, final):
+        status = self.status(final)
+        tmpname = self.fname + '.tmp'
+        with open(tmpname, 'w') as f:
+            json.dump(status, f, indent=2)
+        os.rename(tmpname, self.fname)
+
+        line = "Loaded %d/%d tables, %d rows" % (status['tables_done'], status['tables_total'], status['rows'])
+        if status['percent'] is not None:
+            line += " (%.1f%%)" % status['percent']
+        line += ", %.0f rows/s, %.2f MB/s" % (status['rows_per_s'], status['mb_per_s'])
+        if status['eta_s'] is not None and not final:
+            eta = int(status['eta_s'])
+            line += ", ETA %d:%02d:%02d" % (eta / 3600, eta / 60 % 60, eta % 60)
+        if self.console:
+            sys.stderr.write("\r%-100s%s" % (line, "\n" if final else ""))
+            sys.stderr.flush()
+        elif final:
+            self.logger.info(line)
+        else:
+            self.logger.debug(line)
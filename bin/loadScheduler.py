@@ -0,0 +1,97 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*
+
+# Copyright 2020 Actian Corporation
+
+#    Licensed under the Apache License, Version 2.0 (the "License");
+#    you may not use this file except in compliance with the License.
+#    You may obtain a copy of the License at
+
+#      http://www.apache.org/licenses/LICENSE-2.0
+
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS,
+#    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#    See the License for the specific language governing permissions and
+#    limitations under the License.
+
+import logging
+
+# bytes per column assumed when the catalog gives the row count of a table but not its size
+average_column_width = 16
+
+
+class LoadScheduler:
+    """
+        Order in which load_data submits its copy_table_data tasks to the pool. With the largest-first
+        order the big tables start while the other workers still have work, instead of one late big
+        table keeping the run going after everything else is loaded. Sizes are estimates from the
+        catalog statistics of the source (tbSize query): tables without statistics go first, in catalog
+        order, since they may be the big ones. Small tasks can be packed together up to pack_size bytes,
+        a pack being copied by one worker.
+    """
+
+    def __init__(self, sizes, largest_first=True, pack_size=0):
+        """
+            @:param sizes {(schema, table): (rows, bytes)} from the catalog statistics (None when unknown),
+                   keyed by upper-cased names (see ConvertorUtil.table_key) like the tables added
+            @:param largest_first False to keep the catalog order
+            @:param pack_size pack the tasks smaller than this number of bytes, 0 not to pack
+        """
+        self.sizes = sizes
+        self.largest_first = largest_first
+        self.pack_size = pack_size
+        self.logger = logging.getLogger(__name__)
+        # (estimated bytes or None, copy_table_data task) in catalog order
+        self.tasks = []
+
+    def estimate(self, source_table, column_count):
+        """
+            @:return: estimated size in bytes of a source table, None when the catalog has no statistics
+        """
+        (rows, size) = self.sizes.get(source_table, (None, None))
+        if size is not None and size > 0:
+            return float(size)
+        if rows is not None and rows >= 0:
+            return float(rows) * column_count * average_column_width
+        return None
+
+    def add(self, source_table, column_count, tasks):
+        """
+            Add the tasks of a table, the ranges of a split table sharing its size
+        """
+        size = self.estimate(source_table, column_count)
+        for task in tasks:
+            self.tasks.append((None if size is None else size / len(tasks), task))
+
+    def schedule(self):
+        """
+            @:return: list of work items, a work item being the list of tasks a worker copies one after the other
+        """
+        if not self.largest_first:
+            return [[task] for (_, task) in self.tasks]
+
+        unknown = [[task] for (size, task) in self.tasks if size is None]
+        known = sorted([(size, task) for (size, task) in self.tasks if size is not None],
+                       key=lambda item: item[0], reverse=True)
+        packs = []
+        for (size, task) in known:
+            if size < self.pack_size:
+                # first fit decreasing
+                for pack in packs:
+                    if pack[0] + size <= self.pack_size:
+                        pack[0] += size
+                        pack[1].append(task)
+                        break
+                else:
+                    packs.append([size, [task]])
+            else:
+                packs.append([size, [task]])
+        packs.sort(key=lambda pack: pack[0], reverse=True)
+
+        for (size, tasks) in packs:
+            self.logger.debug("Scheduled %s - Estimated size(MB): %f" % (
+                ", ".join(task[0] for task in tasks), size / 1024 / 1024))
+        if unknown:
+            self.logger.info("No size statistics for %d task(s), scheduled first" % len(unknown))
+        return unknown + [tasks for (_, tasks) in packs]
@@ -0,0 +1,124 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*
+
+# Copyright 2020 Actian Corporation
+
+#    Licensed under the Apache License, Version 2.0 (the "License");
+#    you may not use this file except in compliance with the License.
+#    You may obtain a copy of the License at
+
+#      http://www.apache.org/licenses/LICENSE-2.0
+
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS,
+#    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#    See the License for the specific language governing permissions and
+#    limitations under the License.
+
+import gc
+import os
+import re
+import cProfile
+import pstats
+import logging
+import resource
+import itertools
+from collections import defaultdict
+
+try:
+    import tracemalloc
+except ImportError:
+    # Python 2 has tracemalloc only with the pytracemalloc backport (patched interpreter)
+    tracemalloc = None
+
+# frames kept by tracemalloc for every allocation
+trace_frames = 10
+
+
+class RunProfiler:
+    """
+        --profile and --trace-memory: cProfile statistics and memory snapshots around a call
+        (SchemaConvertor.convert and, with --profile-tasks, every copy_table_data task), written to
+        <prefix>_<name>.prof (pstats), <prefix>_<name>_profile.txt and <prefix>_<name>_memory.txt.
+        cProfile only sees the thread it runs in: the threads loading data are profiled by their tasks.
+        Memory snapshots are process wide. Without tracemalloc they show the growth of the objects
+        tracked by the garbage collector per type and the peak RSS instead of allocations per line.
+    """
+
+    def __init__(self, prefix, profile=False, trace_memory=False, tasks=False, top=30):
+        """
+            @:param prefix of the output files
+            @:param tasks profile every copy_table_data task too
+            @:param top lines of the text reports
+        """
+        self.prefix = prefix
+        self.profile = profile
+        self.trace_memory = trace_memory
+        self.tasks = tasks
+        self.top = top
+        self.logger = logging.getLogger(__name__)
+        self.task_numbers = itertools.count(1)
+        if trace_memory and tracemalloc is not None and not tracemalloc.is_tracing():
+            tracemalloc.start(trace_frames)
+
+    def task_name(self, table_name):
+        """
+            Name of the output files of a copy_table_data task (tasks of split tables share the table)
+        """
+        return "task_%s_%d_%d" % (re.sub(r'\W+', '_', table_name).strip('_'), os.getpid(), next(self.task_numbers))
+
+    def run(self, name, func, *args):
+        """
+            Call func(*args) under the profiler and between two memory snapshots
+            @:return: result of func
+        """
+        profiler = cProfile.Profile() if self.profile else None
+        before = self.snapshot() if self.trace_memory else None
+        try:
+            if profiler is not None:
+                return profiler.runcall(func, *args)
+            return func(*args)
+        finally:
+            try:
+                if profiler is not None:
+                    self.write_profile(name, profiler)
+                if before is not None:
+                    self.write_memory(name, before, self.snapshot())
+            except Exception as ex:
+                self.logger.warn("Profile of %s not written: %s" % (name, ex))
+
+    def write_profile(self, name, profiler):
+        fname = "%s_%s.prof" % (self.prefix, name)
+        profiler.dump_stats(fname)
+        with open("%s_%s_profile.txt" % (self.prefix, name), 'w') as f:
+            stats = pstats.Stats(profiler, stream=f)
+            stats.sort_stats('cumulative').print_stats(self.top)
+            stats.sort_stats('tottime').print_stats(self.top)
+        self.logger.info("Profile of %s written to %s" % (name, fname))
+
+    @staticmethod
+    def snapshot():
+        if tracemalloc is not None:
+            return tracemalloc.take_snapshot()
+        counts = defaultdict(int)
+        for obj in gc.get_objects():
+            counts[type(obj).__name__] += 1
+        return counts
+
+    def write_memory(self, name, before, after):
+        fname = "%s_%s_memory.txt" % (self.prefix, name)
+        with open(fname, 'w') as f:
+            f.write("Peak RSS (KB): %d\n" % resource.getrusage(resource.RUSAGE_SELF).ru_maxrss)
+            if tracemalloc is not None:
+                (current, peak) = tracemalloc.get_traced_memory()
+                f.write("Traced memory (KB): %d, peak: %d\n\n" % (current / 1024, peak / 1024))
+                for stat in after.compare_to(before, 'lineno')[:self.top]:
+                    f.write("%s\n" % stat)
+            else:
+                f.write("\nObjects tracked by the garbage collector (type, count, growth):\n")
+                growth = sorted(after, key=lambda type_name: after[type_name] - before.get(type_name, 0),
+                                reverse=True)
+                for type_name in growth[:self.top]:
+                    f.write("%-40s %10d %+10d\n" % (type_name, after[type_name],
+                                                     after[type_name] - before.get(type_name, 0)))
+        self.logger.info("Memory snapshot of %s written to %s" % (name, fname))
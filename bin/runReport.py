@@ -0,0 +1,114 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*
+
+# Copyright 2020 Actian Corporation
+
+#    Licensed under the Apache License, Version 2.0 (the "License");
+#    you may not use this file except in compliance with the License.
+#    You may obtain a copy of the License at
+
+#      http://www.apache.org/licenses/LICENSE-2.0
+
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS,
+#    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#    See the License for the specific language governing permissions and
+#    limitations under the License.
+
+import json
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from datetime import datetime
+from threading import Lock
+
+# stages of a table copy, in pipeline order: source fetch, row encoding (Python), target insert and commit
+stages = ('fetch', 'encode', 'insert')
+
+
+class RunReport:
+    """
+        Timings of a run: elapsed time of every phase of SchemaConvertor.convert (catalog, DDL generation,
+        DDL execution, data load, ...) and, for every table copied or unloaded, the time spent in each
+        stage by each worker. The totals per stage show whether the source, Python or the target
+        is the bottleneck. Written as JSON at the end of the run.
+    """
+
+    def __init__(self):
+        self.started = time.time()
+        self.lock = Lock()
+        # phase -> seconds
+        self.phases = OrderedDict()
+        # (phase, table) -> {'rows', 'mb', 'seconds', 'tasks', stage: seconds, 'workers': {worker: seconds}}
+        self.tables = OrderedDict()
+
+    @contextmanager
+    def phase(self, name):
+        """
+            Time the block as (a part of) phase name
+        """
+        t1 = time.time()
+        try:
+            yield
+        finally:
+            with self.lock:
+                self.phases[name] = self.phases.get(name, 0.0) + time.time() - t1
+
+    def add_task(self, phase, table_name, worker, rows, size, elapsed, timings):
+        """
+            Account a task copying (a range of) a table
+            @:param worker thread or process which ran the task
+            @:param size estimated bytes
+            @:param elapsed seconds of the task
+            @:param timings {stage: seconds}, without fetch the time not spent in the other stages is fetch time
+                    (stages overlap with --pipeline)
+        """
+        with self.lock:
+            table = self.tables.get((phase, table_name))
+            if table is None:
+                table = OrderedDict([('rows', 0), ('mb', 0.0), ('tasks', 0), ('seconds', 0.0)] +
+                                    [(stage, 0.0) for stage in stages] + [('workers', OrderedDict())])
+                self.tables[(phase, table_name)] = table
+            table['rows'] += rows
+            table['mb'] += size / 1024 / 1024
+            table['tasks'] += 1
+            table['seconds'] += elapsed
+            other = 0.0
+            for stage in stages[1:]:
+                table[stage] += timings.get(stage, 0.0)
+                other += timings.get(stage, 0.0)
+            table['fetch'] += timings['fetch'] if 'fetch' in timings else max(elapsed - other, 0.0)
+            table['workers'][str(worker)] = table['workers'].get(str(worker), 0.0) + elapsed
+
+    def result(self):
+        result = OrderedDict()
+        result['started'] = datetime.fromtimestamp(self.started).isoformat()
+        result['elapsed_s'] = round(time.time() - self.started, 3)
+        result['phases'] = OrderedDict((name, round(seconds, 3)) for (name, seconds) in self.phases.items())
+        totals = OrderedDict((stage, 0.0) for stage in stages)
+        workers = OrderedDict()
+        tables = []
+        for ((phase, table_name), table) in self.tables.items():
+            entry = OrderedDict([('phase', phase), ('table', table_name)])
+            for (key, value) in table.items():
+                if key == 'workers':
+                    entry[key] = OrderedDict((worker, round(seconds, 3)) for (worker, seconds) in value.items())
+                    for (worker, seconds) in value.items():
+                        workers[worker] = workers.get(worker, 0.0) + seconds
+                else:
+                    entry[key] = round(value, 3) if isinstance(value, float) else value
+            for stage in stages:
+                totals[stage] += table[stage]
+            tables.append(entry)
+        busy = sum(totals.values())
+        result['stages'] = OrderedDict((stage, OrderedDict([('seconds', round(seconds, 3)),
+                                                            ('share', round(seconds / busy, 3) if busy else None)]))
+                                       for (stage, seconds) in totals.items())
+        result['bottleneck'] = max(totals, key=totals.get) if busy else None
+        result['workers'] = OrderedDict((worker, round(seconds, 3)) for (worker, seconds) in workers.items())
+        result['tables'] = tables
+        return result
+
+    def write(self, fname):
+        with open(fname, 'w') as f:
+            json.dump(self.result(), f, indent=2)
@@ -39,37 +39,178 @@
 
 
 import codecs
+import hashlib
+import json
+import os
+import re
+import shlex
 import sys
 import time
 import logging
 import warnings
-import xml.dom.minidom
-from datetime import datetime                             
+from datetime import datetime, date
+from decimal import Decimal
 from string import Template
-from xml.dom.minidom import Node
+from collections import OrderedDict
 
 from concurrent.futures import ThreadPoolExecutor, wait
-from multiprocessing import RawValue
-from threading import Lock
+import multiprocessing
+from threading import Thread, current_thread
 import subprocess
 import typesMapping
-from driverTools import dbconnector
+from driverTools import dbconnector, getDbStringDetails, ConnectorPool
+from templateRegistry import get_registry
+from loadBenchmark import LoadBenchmark
+from sourceCatalog import SourceCatalog
+from loadJournal import LoadJournal
+from loadScheduler import LoadScheduler
+from loadProgress import Counter, LoadProgress
+from runReport import RunReport
+from batchPipeline import BatchPipeline
+from batchSizer import BatchSizer
+from unloadWriter import UnloadWriter
+from columnarWriter import ColumnarWriter
 
 log_dtm_txt=str(datetime.now().strftime("%d_%b_%y_%H%M"))
 
-class Counter(object):
-    def __init__(self, value=0):
-        # RawValue because we don't need it to create a Lock:
-        self.val = RawValue('i', value)
-        self.lock = Lock()
+# Source datatypes of a primary key a table can be split on (see --chunks)
+numeric_key_types = ('INT', 'INTEGER', 'BIGINT', 'SMALLINT', 'TINYINT', 'MEDIUMINT', 'BYTEINT',
+                     'INT2', 'INT4', 'INT8', 'SERIAL', 'SERIAL4', 'SERIAL8', 'BIGSERIAL',
+                     'NUMBER', 'NUMERIC', 'DECIMAL')
 
-    def add(self, value):
-        with self.lock:
-            self.val.value += value
+class RowEncoder(object):
+    """
+        Row formatter compiled once per table from an INSERT statement or an unload line layout
+        whose values are "<Vn>" placeholders, quoted or not as in the types_mapping insert casts.
+        A row is encoded in a single pass instead of replacing every placeholder in the statement.
+    """
+    placeholder = re.compile(r"'<V(\d+)>'|<V(\d+)>")
 
-    def get(self):
-        with self.lock:
-            return self.val.value
+    def __init__(self, layout, null_text):
+        """
+            @:param layout statement or line with <Vn> placeholders
+            @:param null_text text of a NULL value (quotes around the placeholder are dropped)
+        """
+        self.head = u''
+        # (row index, formatter, literal text following the value)
+        self.columns = []
+        position = 0
+        for match in self.placeholder.finditer(layout):
+            literal = unicode(layout[position:match.start()])
+            if self.columns:
+                self.columns[-1] = self.columns[-1][:2] + (literal,)
+            else:
+                self.head = literal
+            if match.group(1) is not None:
+                self.columns.append((int(match.group(1)), self.formatter(null_text, u"'"), u''))
+            else:
+                self.columns.append((int(match.group(2)), self.formatter(null_text, u''), u''))
+            position = match.end()
+        tail = unicode(layout[position:])
+        if self.columns:
+            self.columns[-1] = self.columns[-1][:2] + (tail,)
+        else:
+            self.head += tail
+
+    @staticmethod
+    def formatter(null_text, quote):
+        """
+            Build the formatter of one column: NULL, quote escaping, numbers and other values
+        """
+        def format_value(value):
+            if value is None:
+                return null_text
+            if isinstance(value, unicode):
+                return quote + value.replace(u"'", u"''") + quote
+            if isinstance(value, str):
+                # not utf-8 (see strip_row): keep what can be decoded
+                return quote + unicode(value, 'utf-8', 'ignore').replace(u"'", u"''") + quote
+            if isinstance(value, float):
+                # repr keeps all the significant digits, str rounds to 12
+                return quote + repr(value) + quote
+            if isinstance(value, (bytearray, buffer)):
+                # binary values are not utf-8: the bytes that aren't are replaced instead of failing the row
+                return quote + unicode(str(value), 'utf-8', 'replace').replace(u"'", u"''") + quote
+            return quote + unicode(str(value), 'utf-8', 'replace') + quote
+        return format_value
+
+    def encode(self, row):
+        """
+            @:param row values in select order
+            @:return: unicode statement or line
+        """
+        result = [self.head]
+        for (index, format_value, literal) in self.columns:
+            result.append(format_value(row[index]))
+            result.append(literal)
+        return u''.join(result)
+
+
+class TransactionControl(object):
+    """
+        --commit-every: commit the batches inserted by a copy_table_data task every N rows, every N seconds
+        or once at the end of the task (one transaction per table or --chunks range), instead of one
+        commit per batch. Targets whose connection can't leave autocommit keep committing every batch.
+    """
+
+    def __init__(self, connector, rows=0, seconds=0, enabled=False):
+        """
+            @:param connector target dbconnector of the task
+            @:param rows commit once this number of rows is inserted, 0 not to count rows
+            @:param seconds commit once this number of seconds elapsed since the last commit, 0 not to time
+            @:param enabled open a transaction (with rows and seconds 0: committed at the end only)
+        """
+        self.connector = connector
+        self.rows = rows
+        self.seconds = seconds
+        # the batches are committed here instead of by insert_sql/insert_many
+        self.explicit = enabled and connector.begin()
+        if enabled and not self.explicit:
+            logging.getLogger(__name__).debug("%s target can't leave autocommit, every batch is committed"
+                                              % connector.dbtype)
+        # rows and estimated bytes inserted since the last commit
+        self.pending = 0
+        self.pending_size = 0.0
+        self.last_commit = time.time()
+
+    def batch(self, rows, size=0.0):
+        """
+            A batch of rows was inserted
+            @:param size estimated bytes of the batch
+            @:return: True when the rows inserted so far are committed
+        """
+        if not self.explicit:
+            return True
+        self.pending += rows
+        self.pending_size += size
+        if (self.rows and self.pending >= self.rows) or \
+                (self.seconds and time.time() - self.last_commit >= self.seconds):
+            self.connector.commit()
+            self.pending = 0
+            self.pending_size = 0.0
+            self.last_commit = time.time()
+            return True
+        return False
+
+    def rollback(self):
+        """
+            Roll back the batches not committed yet (a batch failed and --on_error continues the load)
+            @:return: (rows, estimated bytes) rolled back
+        """
+        rolled_back = (self.pending, self.pending_size)
+        if self.explicit:
+            self.connector.rollback()
+        self.pending = 0
+        self.pending_size = 0.0
+        return rolled_back
+
+    def end(self, commit=True):
+        """
+            Commit (or roll back) the rows not committed yet and go back to autocommit
+        """
+        if self.explicit:
+            self.explicit = False
+            self.connector.end(commit)
 
 
 class ConvertorUtil:
@@ -78,24 +219,123 @@ class ConvertorUtil:
         self.xml_path = xml_path
         self.inserted_queries_number = Counter()
         self.logger = logging.getLogger(__name__)
-        self.connectors = []
+        # source/target connector pairs shared by the phases and the loading workers
+        self.pool = None
+        # metadata of the source read once per run (see metadata())
+        self.catalog = SourceCatalog(params.src, self.strip_row)
+        # (file name, key, signature) of the on-disk copy of the catalog (see load_metadata_cache())
+        self.catalog_cache = None
+        # checkpoints of load_data (see open_journal())
+        self.journal = None
+        # rows and bytes loaded per table by load_data (see LoadProgress)
+        self.progress = None
+        # phase and table timings of the run
+        self.report = RunReport()
+        # RunProfiler of --profile/--trace-memory, profiles the tasks with --profile-tasks
+        self.profiler = None
 
     def get_xml_data(self, dbtype, sql, identifier):
         """
             Get SQL definition from XML file. SQL is retrieved by using keywords passed as function parameters
+            The file is parsed once (see templateRegistry) and again only when it is modified.
             @:param dbtype Database type "mysql, mssql, ..."
             @:param sql Sqltype : Select, Create, ...
             @:param identifier Unique Identifier
         """
-        result = ""
-        xmldoc = xml.dom.minidom.parse(self.xml_path)
-        for node in xmldoc.getElementsByTagName(dbtype)[0].getElementsByTagName(sql):
-            if node.getAttribute("id") == identifier:
-                for child in node.childNodes:
-                    if child.nodeType == Node.TEXT_NODE:
-                        result = child.data
-                        break
-        return result
+        return get_registry(self.xml_path).get(dbtype, sql, identifier)
+
+    def get_template(self, dbtype, sql, identifier):
+        """
+            Get SQL definition from XML file as a precompiled (and stripped) string.Template
+            @:param dbtype Database type "mysql, mssql, ..."
+            @:param sql Sqltype : Select, Create, ...
+            @:param identifier Unique Identifier
+        """
+        return get_registry(self.xml_path).template(dbtype, sql, identifier)
+
+    def definition_sql(self, source_db_type, identifier, types_to_skip=''):
+        """
+            Text of a source metadata query (<select id=identifier>) for the --source_schema filter
+            @:param source_db_type
+            @:param identifier tbDefinition, ukDefinition, ...
+            @:param types_to_skip csv of the source types the query must not return (tbDefinition)
+        """
+        sql = self.get_template(dbtype=source_db_type, sql="select", identifier=identifier)
+        return sql.safe_substitute(types_to_skip=types_to_skip, schema_filter=self.params.source_schema)
+
+    def metadata(self, source_connector, identifier, types_to_skip=''):
+        """
+            Rows (stripped) of a source metadata query, read from the catalog snapshot
+            @:param source_connector connection used when the query was not fetched yet
+        """
+        sql = self.definition_sql(source_connector.dbtype, identifier, types_to_skip)
+        return self.catalog.rows(source_connector, identifier, sql)
+
+    def metadata_queries(self, source_db_type, target_db_type):
+        """
+            Metadata queries needed by the phases selected on the command line, as (identifier, sql)
+        """
+        identifiers = []
+        queries = []
+        if self.params.cretab:
+            types_to_skip = ''
+            if self.params.skip_unsupported:
+                types_to_skip = typesMapping.get_unsupported_types_csv(source_db_type, target_db_type)
+            queries.append(('tbDefinition', self.definition_sql(source_db_type, 'tbDefinition', types_to_skip)))
+        if self.params.loadata or self.params.unload or self.params.load_vwload or self.params.load_cpvwl:
+            types_to_skip = typesMapping.get_unsupported_types_csv(source_db_type, target_db_type)
+            queries.append(('tbDefinition', self.definition_sql(source_db_type, 'tbDefinition', types_to_skip)))
+        if self.params.creview or self.params.creall:
+            identifiers.append('viwDefinition')
+        if self.params.creall or self.params.creindex or (self.params.loadata and self.params.table_chunks > 1):
+            identifiers.append('ukDefinition')
+        if self.params.loadata and (self.params.schedule == 'largest' or self.params.progress_interval > 0):
+            identifiers.append('tbSize')
+        if self.params.creall or self.params.creindex:
+            identifiers += ['ixDefinition', 'fkDefinition']
+        if self.params.dmpobj or self.params.creall:
+            identifiers += ['ProcDefinition', 'TriggerDefinition', 'FunctionDefinition', 'PackageDefinition']
+        for identifier in identifiers:
+            queries.append((identifier, self.definition_sql(source_db_type, identifier)))
+        return queries
+
+    def load_metadata_cache(self, source_connector):
+        """
+            --metadata-cache: reuse the catalog snapshot of a previous run on the same source and
+            --source_schema, unless --refresh-metadata is set or the catalog signature of the source (lastDdl
+            query: last DDL time and number of tables and columns, so that a dropped table changes it too)
+            changed. Without lastDdl query the snapshot expires (see SourceCatalog.load).
+        """
+        if not self.params.metadata_cache:
+            return
+        (dbtype, driver, hostname, port, dbname, user, _) = getDbStringDetails(self.params.src)
+        key = (dbtype, driver, hostname, port, dbname, user, self.params.source_schema)
+        fname = "%s_metadata_%s.cache" % (self.params.program_name, hashlib.sha1(repr(key)).hexdigest()[:16])
+
+        signature = None
+        try:
+            sql = self.definition_sql(source_connector.dbtype, "lastDdl")
+        except IndexError:
+            self.logger.info("No catalog definitions for %s, metadata cache not used" % source_connector.dbtype)
+            return
+        if sql.strip() != "":
+            cur = source_connector.execute(sql)
+            if cur is None:
+                self.logger.warn("Last DDL time of the source not available, metadata cache not used")
+                self.catalog_cache = (fname, key, None)
+                return
+            signature = ",".join(str(value) for line in cur for value in line)
+
+        self.catalog_cache = (fname, key, signature)
+        if not self.params.refresh_metadata:
+            self.catalog.load(fname, key, signature)
+
+    def save_metadata_cache(self):
+        if self.catalog_cache is not None:
+            try:
+                self.catalog.save(*self.catalog_cache)
+            except Exception as ex:
+                self.logger.warn("Metadata cache not saved: %s" % ex)
 
     def strip_row(self, row):
         """
@@ -153,40 +393,12 @@ class ConvertorUtil:
         :param col: column to check
         :return: true if table.column should be processed False otherwise
         """
-        result = False
-        table = table.upper()
-        col = col.upper()
-        full_col_name = "{0}.{1}".format(table, col)
-        if self.params.include_tables or self.params.include_columns:
-            if table in [x.upper() for x in self.params.include_tables]:
-                if full_col_name in [x.upper() for x in self.params.exclude_columns]:
-                    self.logger.debug("{0} is in exclude columns. Skipping...".format(full_col_name))
-                else:
-                    self.logger.debug("{0} is not in exclude list. Take it...".format(full_col_name))
-                    result = True
-            elif self.params.include_columns:
-                if full_col_name in [x.upper() for x in self.params.include_columns]:
-                    self.logger.debug("{0} is in include columns list. Take it...".format(full_col_name))
-                    result = True
-                else:
-                    self.logger.debug("{0} is not in include columns list. Skipping...".format(full_col_name))
-            else:
-                self.logger.debug("{0} is not in include tables. Skipping...".format(table))
-        elif self.params.exclude_tables or self.params.exclude_columns:
-            if table in [x.upper() for x in self.params.exclude_tables]:
-                self.logger.debug("{0} is in exclude tables. Skipping...".format(table))
-            elif self.params.exclude_columns:
-                if full_col_name in [x.upper() for x in self.params.exclude_columns]:
-                    self.logger.debug("{0} is in exclude columns. Skipping...".format(full_col_name))
-                else:
-                    self.logger.debug("{0} is not in exclude columns. Take it...".format(full_col_name))
-                    result = True
-            else:
-                self.logger.debug("{0} is not in exclude list. Take it...".format(table))
-                result = True
-        else:
-            self.logger.debug("Column '{0}' exclude&include rules not set. Take it...".format(full_col_name))
-            result = True
+        key = (table, col)
+        if key in self.params.included:
+            return self.params.included[key][0]
+        (result, reason) = self.params.is_included(table, col)
+        # logged the first time only
+        self.logger.debug(reason)
         return result
 
     def generate_tb(self, source_connector, target_db_type):
@@ -218,17 +430,12 @@ class ConvertorUtil:
         else:
             types_to_warn = typesMapping.get_unsupported_types(source_db_type, target_db_type)
 
-        sql = Template(self.get_xml_data(dbtype=source_db_type, sql="select", identifier="tbDefinition").strip())
-        sql = sql.substitute(types_to_skip=types_to_skip, schema_filter=self.params.source_schema)
-
         s = self.get_xml_data(dbtype=target_db_type, sql="create", identifier="tb").strip()
         ddl += s.split('\n')
         s = self.get_xml_data(dbtype=target_db_type, sql="create", identifier="drop").strip()
         drp += s.split('\n')
 
-        cur = source_connector.execute(sql)
-        for line in cur:
-            row = self.strip_row(line)
+        for row in self.metadata(source_connector, "tbDefinition", types_to_skip):
 
             # skip not included cols and tables
             if not self.is_included(row[1], row[2]):
@@ -265,7 +472,7 @@ class ConvertorUtil:
                 rls.append(s + self.params.command_separator + "\n")
 
             if is_new_schema:
-                s = Template(self.get_xml_data(dbtype=target_db_type, sql="create", identifier="sch").strip())
+                s = self.get_template(dbtype=target_db_type, sql="create", identifier="sch")
                 s = s.substitute(scname=self.quote(target_schema))
                 is_new_schema = False
                 if s != "":
@@ -343,16 +550,11 @@ class ConvertorUtil:
         s = ""
         rls = []
 
-        sql = Template(self.get_xml_data(dbtype=source_connector.dbtype, sql="select", identifier="viwDefinition"))
-        sql = sql.safe_substitute(schema_filter=self.params.source_schema)
         s = self.get_xml_data(dbtype=target_db_type, sql="create", identifier="viw").strip()
-        self.logger.debug( sql )
 
         # START View
-        cur = source_connector.execute(sql)
-        for line in cur:
-            self.logger.debug( line )
-            row = self.strip_row(line)
+        for row in self.metadata(source_connector, "viwDefinition"):
+            self.logger.debug( row )
 
             # An attempt to get one schema only loaded
             source_schema = row[0]
@@ -389,7 +591,7 @@ class ConvertorUtil:
                 is_new_view = True
 
                 if is_new_schema:
-                    s = Template(self.get_xml_data(dbtype=target_db_type, sql="create", identifier="sch").strip())
+                    s = self.get_template(dbtype=target_db_type, sql="create", identifier="sch")
                     s = s.substitute(scname=self.quote(target_schema))
                     is_new_schema = False
                     if s != "":
@@ -422,12 +624,8 @@ class ConvertorUtil:
         first_row=0
         proc_cnt=0
 
-        sql = Template(self.get_xml_data(dbtype=source_connector.dbtype, sql="select", identifier="ProcDefinition"))
-        sql = sql.safe_substitute(schema_filter=self.params.source_schema)
 
-        cur = source_connector.execute(sql)
-        for line in cur:
-            row = self.strip_row(line)
+        for row in self.metadata(source_connector, "ProcDefinition"):
             proc_name = row[0].lower()
             proc_text = row[1].lower()
             if first_row == 0:
@@ -469,12 +667,8 @@ class ConvertorUtil:
         first_row=0
         trg_cnt=0
 
-        sql = Template(self.get_xml_data(dbtype=source_connector.dbtype, sql="select", identifier="TriggerDefinition"))
-        sql = sql.safe_substitute(schema_filter=self.params.source_schema)
 
-        cur = source_connector.execute(sql)
-        for line in cur:
-            row = self.strip_row(line)
+        for row in self.metadata(source_connector, "TriggerDefinition"):
             trigger_name = row[0].lower()
             trigger_text = row[1].lower()
             if first_row == 0:
@@ -517,12 +711,8 @@ class ConvertorUtil:
         first_row = 0
         func_cnt=0
 
-        sql = Template(self.get_xml_data(dbtype=source_connector.dbtype, sql="select", identifier="FunctionDefinition"))
-        sql = sql.safe_substitute(schema_filter=self.params.source_schema)
 
-        cur = source_connector.execute(sql)
-        for line in cur:
-            row = self.strip_row(line)
+        for row in self.metadata(source_connector, "FunctionDefinition"):
             function_name = row[0].lower()
             function_text = row[1].lower()
             if first_row == 0:
@@ -566,12 +756,8 @@ class ConvertorUtil:
         # # # DGC
         global log_dtm_txt
 
-        sql = Template(self.get_xml_data(dbtype=source_connector.dbtype, sql="select", identifier="PackageDefinition"))
-        sql = sql.safe_substitute(schema_filter=self.params.source_schema)
 
-        cur = source_connector.execute(sql)
-        for line in cur:
-            row = self.strip_row(line)
+        for row in self.metadata(source_connector, "PackageDefinition"):
             package_name = row[0].lower()
             package_text = row[1].lower()
             if first_row == 0:
@@ -619,14 +805,9 @@ class ConvertorUtil:
         s = ""
         rls = []  # A returned list which contains the results of the function
         self.logger.debug(source_connector.dbtype)
-        sql = Template(self.get_xml_data(dbtype=source_connector.dbtype, sql="select", identifier="ukDefinition"))
-        sql = sql.safe_substitute(schema_filter=self.params.source_schema)
-        #self.logger.debug(sql)
         ddl = self.get_xml_data(dbtype=target_db_type, sql="create", identifier="uk").strip()
 
-        cur = source_connector.execute(sql)
-        for line in cur:
-            row = self.strip_row(line)
+        for row in self.metadata(source_connector, "ukDefinition"):
 
             # skip not included cols and tables
             if not self.is_included(row[1], row[4]):
@@ -691,13 +872,9 @@ class ConvertorUtil:
         s = ""
         rls = []
 
-        sql = Template(self.get_xml_data(dbtype=source_connector.dbtype, sql="select", identifier="fkDefinition"))
-        sql = sql.safe_substitute(schema_filter=self.params.source_schema)
         ddl = self.get_xml_data(dbtype=target_db_type, sql="create", identifier="fk").strip()
 
-        cur = source_connector.execute(sql)
-        for line in cur:
-            row = self.strip_row(line)
+        for row in self.metadata(source_connector, "fkDefinition"):
 
             # skip not included cols and tables (both for source and referenced tables)
             if not self.is_included(row[1], row[3]) or not self.is_included(row[5], row[6]):
@@ -773,15 +950,10 @@ class ConvertorUtil:
         s = ""
         rls = []
 
-        sql = Template(self.get_xml_data(dbtype=source_connector.dbtype, sql="select", identifier="ixDefinition"))
-        sql = sql.safe_substitute(schema_filter=self.params.source_schema)
 
         ddl = self.get_xml_data(dbtype=target_db_type, sql="create", identifier="ix").strip()
-        self.logger.debug(sql)
 
-        cur = source_connector.execute(sql)
-        for line in cur:
-            row = self.strip_row(line)
+        for row in self.metadata(source_connector, "ixDefinition"):
 
             # skip not included cols and tables
             if not self.is_included(row[1], row[6]):
@@ -826,37 +998,33 @@ class ConvertorUtil:
         self.logger.debug("generate_ix completed")
         return rls
 
-    def unload_data(self, source_connector, target_db_type):
+    def prepare_unload_sqls(self, source_connector, target_db_type):
         """
-            Extract data from src db and load data to dest db
+            Build the SELECT and the delimited line layout of every table to extract.
+            Returns a list of (fname, colnum, select, insert, target_schema, table_name, columns) where
+            columns is the list of (column name, target data type) of the table
             @:param source_connector
             @:param target_db_type
         """
-        self.logger.debug("Running unload_data processing")
         source_schema = ""
         source_schema_prev = ""
         table_name = ""
         table_name_prev = ""
+        target_schema = None
         insert = ""
         fname = ""
-        counter = 0
         select = ""
         sqls = []
         s = ""
         colnum = 0
         selfrom = ""
+        columns = []
 
         types_mapping = typesMapping.get_types_mapping(source_connector.dbtype, target_db_type)
         types_to_skip = typesMapping.get_unsupported_types_csv(source_connector.dbtype, target_db_type)
 
-        sql = Template(self.get_xml_data(dbtype=source_connector.dbtype, sql="select", identifier="tbDefinition").strip())
-        sql = sql.substitute(types_to_skip=types_to_skip, schema_filter=self.params.source_schema)
-
-        cursrc = source_connector.execute(sql)
-
         # Iterate to prepare statements select, insert
-        for line in cursrc:
-            row = self.strip_row(line)
+        for row in self.metadata(source_connector, "tbDefinition", types_to_skip):
 
             # skip not included cols and tables
             if not self.is_included(row[1], row[2]):
@@ -866,12 +1034,13 @@ class ConvertorUtil:
             table_name = row[1]
 
             if (source_schema_prev, table_name_prev) != (source_schema, table_name):
-                source_schema_prev = source_schema
-                table_name_prev = table_name
 
                 if len(s) > 0:
                     select += selfrom
-                    sqls.append((fname, colnum, select, insert))
+                    sqls.append((fname, colnum, select, insert, target_schema, table_name_prev, columns))
+
+                source_schema_prev = source_schema
+                table_name_prev = table_name
 
                 s = self.quote(table_name) if source_schema is None else self.quote(source_schema) + '.' + self.quote(
                     table_name)
@@ -883,6 +1052,7 @@ class ConvertorUtil:
                 fname = s
                 insert = ""
                 colnum = 0
+                columns = []
 
             if colnum > 0:
                 insert += self.params.fdelim
@@ -898,101 +1068,207 @@ class ConvertorUtil:
             select = select.replace('<COLNAME>', '"' + clname + '"')
             insert += insert_cast
             insert = insert.replace('<VALUE>', '<V' + str(colnum) + '>')
+            # the data type of the column in the DDL of generate_tables, text when the select converts the
+            # value (e.g. CONVERT(VARCHAR,<COLNAME>,121) of mssql/sybase dates)
+            precision = row[4] if row[4] > 0 else self.params.charmax
+            scale = 0 if row[5] is None else row[5]
+            if select_cast.strip() == '<COLNAME>':
+                column_type = types_mapping[tyname.upper()][0].replace('<PRECISION>', str(int(precision))) \
+                    .replace('<SCALE>', str(int(scale)))
+            else:
+                column_type = 'VARCHAR'
+            columns.append((clname, column_type))
 
             colnum += 1
 
-        select += selfrom+";"
-        sqls.append((fname, colnum, select, insert))
+        if colnum > 0:
+            select += selfrom+";"
+            sqls.append((fname, colnum, select, insert, target_schema, table_name, columns))
+        return sqls
 
-        # Iterate to select, bind and insert data
-        for (fname, colnum, select, insert) in sqls:
-            try:
-                self.logger.debug(select)
-                s = ""
-                sz = 0.0
-                counter = 0
-                t1 = time.time()
-                with codecs.open(fname, encoding='utf-8', mode='w') as f:
-                    cursrc = source_connector.execute(select)
-                    for line in cursrc:  # Read source cursor (SELECT)
-                        row = self.strip_row(line)
-                        s = insert
-                        for i in range(0, colnum):  # Prepare INSERT
-                            value = row[i]
-                            if value is None:  # When Null
-                                s = s.replace("'<V" + str(i) + ">'", '')  # Replace NULL value for strings and dates
-                                s = s.replace("<V" + str(i) + ">", '')  # Replace NULL value for integers or floats
-                                sz += 1
-                            elif type(value) == unicode:  # When  string (unicode)
-                                value = value.replace("'", "''")  # Replace simple ' by '' in insert command
-                                s = s.replace("<V" + unicode(str(i), 'utf-8') + ">", value)
-                                sz += len(value)
-                            else:  # When not string
-                                try:
-                                    s = s.replace("<V" + str(i) + ">", str(value))
-                                    sz += len(str(value))  # Not right but gives an idea of the size of numbers
-                                except UnicodeDecodeError:  # String has an unknown character
-                                    self.logger.error("UnicodeDecodeError for column <%d> value = %s" % (i, value))
-                                    value = value.replace("'", "''")  # Replace simple ' by '' in insert command
-                                    s = s.replace("<V" + str(i) + ">", unicode(value, 'utf-8', 'ignore'))
-                                    sz += len(value)
-                        try:  # Write line
-                            f.write(s + "\n")
-                            counter += 1
+    def write_table_file(self, source_connector, fname, colnum, select, insert, files=None, columns=None):
+        """
+            Write the rows returned by select to fname, one delimited line per row, compressed and split in
+            chunks described by a manifest with --compress and --splitsize (see UnloadWriter), or as typed
+            columns with --unload-format parquet|arrow (see ColumnarWriter).
+            Returns the number of rows written, -1 when the file failed or misses rows that can't be encoded
+            or written
+            @:param source_connector
+            @:param fname output file
+            @:param colnum number of columns in select
+            @:param select source query
+            @:param insert line layout with <Vn> placeholders
+            @:param files list the names of the files written are appended to
+            @:param columns [(column name, target data type)] of select, needed by --unload-format parquet|arrow
+        """
+        s = ""
+        sz = 0.0
+        counter = 0
+        skipped = 0
+        failed = False
+        (encode_time, write_time) = (0.0, 0.0)
+        t1 = time.time()
+        encoder = None
+        if columns is not None and self.params.unload_format != 'text':
+            writer = ColumnarWriter(fname, self.params.unload_format, columns, self.params.row_group_size,
+                                    self.params.unload_compression)
+        else:
+            encoder = RowEncoder(insert, '')
+            writer = UnloadWriter(fname, self.params.unload_compression, self.params.split_size * 1024 * 1024)
+        try:
+            self.logger.debug(select)
+            with writer as f:
+                cursrc = source_connector.stream(select, self.params.arraysize)
+                for line in cursrc:  # Read source cursor (SELECT)
+                    encode_start = time.time()
+                    row = self.strip_row(line)
+                    if encoder is None:
+                        # typed values, converted to columns by the writer
+                        s = row
+                        row_sz = 0
+                        for value in row:
+                            row_sz += 1 if value is None else len(value) if isinstance(value, basestring) else 8
+                        sz += row_sz
+                    else:
+                        try:
+                            s = encoder.encode(row) + "\n"
                         except Exception as ex:
-                            self.logger.debug(s)
+                            # a row that can't be encoded is logged and left out, as a line that can't be written
+                            self.logger.debug(row)
                             self.logger.exception(ex)
-            except Exception as ex:
-                self.logger.debug(s)
-                self.logger.exception(ex)
-            finally:
-                t2 = time.time()
-                self.logger.info("Rows extracted: %d - Elapsed time(s): %f - Mean data size(MB): %f\n" % (
-                    counter, (t2 - t1), sz / 1024 / 1024))
+                            skipped += 1
+                            continue
+                        sz += len(s) - 1
+                    write_start = time.time()
+                    encode_time += write_start - encode_start
+                    try:  # Write line
+                        if encoder is None:
+                            f.write(s, row_sz)
+                        else:
+                            f.write(s)
+                        counter += 1
+                    except IOError:
+                        # Reader of a named pipe has gone or the disk is full: stop extracting
+                        raise
+                    except Exception as ex:
+                        if encoder is None:
+                            # a row group that can't be built: the file would miss its rows
+                            raise
+                        self.logger.debug(s)
+                        self.logger.exception(ex)
+                        skipped += 1
+                    write_time += time.time() - write_start
+            if self.params.unload_compression or self.params.split_size or encoder is None:
+                manifest = writer.write_manifest(os.path.basename(fname), format=self.params.unload_format,
+                                                 fdelim=self.params.fdelim if encoder is not None else None)
+                self.logger.debug("%d file(s) of %s listed in %s" % (len(writer.chunks), fname, manifest))
+        except Exception as ex:
+            # e.g. a row group that can't be built or a named pipe whose reader has gone: the file is incomplete
+            self.logger.debug(s)
+            self.logger.error("Failed to unload data to '%s'." % fname)
+            self.handle_error(ex)
+            failed = True
+        finally:
+            if files is not None:
+                files.extend(writer.files)
+            t2 = time.time()
+            self.logger.info("Rows extracted to %s: %d - Elapsed time(s): %f - Mean data size(MB): %f\n" % (
+                fname, counter, (t2 - t1), sz / 1024 / 1024))
+            # writing the file is the insert stage of an unload
+            self.report.add_task('unload', os.path.basename(fname), current_thread().name, counter, sz, t2 - t1,
+                                 {'encode': encode_time, 'insert': write_time})
+        if skipped:
+            self.logger.warn("%d row(s) missing from %s: they could not be encoded or written" % (skipped, fname))
+        if skipped or failed:
+            return -1
+        return counter
+
+    def unload_data(self, source_connector, target_db_type):
+        """
+            Extract data from src db to delimited files, --threads tables at a time, each worker
+            reading through its own source connection of the pool and writing its own files
+            @:param source_connector
+            @:param target_db_type
+        """
+        self.logger.debug("Running unload_data processing")
+        sqls = self.prepare_unload_sqls(source_connector, target_db_type)
+
+        if self.params.threads == 1 or self.pool is None:
+            # Iterate to select, bind and write data
+            failed = 0
+            for (fname, colnum, select, insert, _, _, columns) in sqls:
+                if self.write_table_file(source_connector, fname, colnum, select, insert, columns=columns) < 0:
+                    failed += 1
+            if failed:
+                self.logger.warn("%d table(s) not completely unloaded" % failed)
+            return
+
+        self.logger.info('Started unloading data from tables. Thread count: ' + str(self.params.threads))
+        start_time = time.time()
+        futures = []
+        pool = ThreadPoolExecutor(self.params.threads)
+        for (fname, colnum, select, insert, _, _, columns) in sqls:
+            futures.append(pool.submit(self.unload_table, fname, colnum, select, insert, columns))
+        wait(futures)
+        pool.shutdown()
+        results = [f.result() for f in futures if f.exception() is None]
+        rows = sum(result for result in results if result is not None and result >= 0)
+        failed = len(sqls) - len([result for result in results if result is not None and result >= 0])
+        if failed:
+            self.logger.warn("%d table(s) not completely unloaded" % failed)
+        self.logger.info("Data from all tables (%d) was unloaded: %d rows. Total Elapsed time: %f" %
+                         (len(sqls), rows, time.time() - start_time))
+
+    def unload_table(self, fname, colnum, select, insert, columns):
+        """
+            write_table_file through a source connection checked out from the pool
+            Returns the number of rows written
+        """
+        connector = None
+        try:
+            connector = self.pool.checkout()
+            self.logger.debug("[Thread #%d] Unloading... %s" % (connector[2], fname))
+            return self.write_table_file(connector[0], fname, colnum, select, insert, columns=columns)
+        except Exception as ex:
+            self.logger.error("Failed to unload data for table '" + fname + "'.")
+            self.handle_error(ex)
+        finally:
+            if connector is not None:
+                self.pool.checkin(connector)
 
     def load_test(self, source_connector, target_connector):
         """
-            Loads a lot of data in a single predefined table.
+            Throughput benchmark of the load paths (row, multirow, executemany, bulk) on a synthetic table
+            generated from test_files/NorthwindExtended.sql and loaded in @dest (a local stand-in database,
+            e.g. sqlite://localhost/bench.db or a local postgres). Results are written as JSON.
             @:param source_connector
             @:param target_connector
         """
         # Run precondition script if found (e.g. this can be used to setup session authorization)
-        pres = self.get_xml_data(dbtype=target_connector.dbtype, sql="create", identifier="sch")
+        try:
+            pres = self.get_xml_data(dbtype=target_connector.dbtype, sql="create", identifier="sch")
+        except IndexError:
+            # no definitions for this target type (e.g. sqlite)
+            pres = ""
         sch = Template(pres).substitute(scname=self.quote(self.params.get_target_schema("dbo")),
                                         insert_mode=self.params.insert_mode).strip()
 
         # do not alter DB in trial mode
-        if not self.params.trial:
+        if self.params.trial:
+            self.logger.warn("--loadtest does nothing in trial mode")
+            return
+        if sch != "":
             target_connector.execute(sch)
 
-        # Iterate to select, bind and insert data
-        s = ""
-        total = 10000
+        seed_path = "%s/../test_files/NorthwindExtended.sql" % self.params.bin_dir_path
         try:
-            counter = 0
-
-            t1 = time.time()
-            for j in range(0, total / self.params.batchsize):
-                currentCounter = 0
-                inserts = []
-                s = "INSERT INTO dbo.Territories VALUES (%d,'%s',%d)" % (j, "Territory%d" % j, 2 * j)
-                inserts.append(s)
-                for i in range(0, self.params.batchsize - 1):
-                    s = ", (%d,'%s',%d)" % (i, "Territory%d" % i, 2 * i)
-                    inserts.append(s)
-                t2 = time.time()
-                currentCounter += len(inserts) * self.insert_sql(target_connector, ";\n".join(inserts))
-                counter += currentCounter
-                self.logger.info("[%d] Batch inserted: %d - Elapsed time(s): %f" % (j, currentCounter, (t2 - t1)))
-
-            t2 = time.time()
-            self.logger.info("Total rows inserted: %d - Elapsed time(s): %f" % (counter, (t2 - t1)))
-
+            result = LoadBenchmark(self, target_connector).run(seed_path)
+            fname = self.params.program_name + '_' + log_dtm_txt + '_' + log_dtm_db + '_bench.json'
+            self.write_file(fname, json.dumps(result, indent=2, sort_keys=True))
+            self.logger.info("Benchmark results written to %s" % fname)
         except Exception as ex:
-            self.logger.debug(s)
             self.logger.exception(ex)
-        finally:
-            pass
+            self.handle_error(ex)
 
     def load_data(self, source_connector, target_connector):
         """
@@ -1004,24 +1280,21 @@ class ConvertorUtil:
         source_schema_prev = ""
         table_name = ""
         table_name_prev = ""
+        target_table = ""
         count_loaded = 0
         insert = ""
         select = ""
         sqls = []
         s = ""
         colnum = 0
-        table_name = ""
         selfrom = ""
+        # (source schema, source table) -> {column name: source datatype} in select order
+        columns = {}
         types_mapping = typesMapping.get_types_mapping(source_connector.dbtype, target_connector.dbtype)
         types_to_skip = typesMapping.get_unsupported_types_csv(source_connector.dbtype, target_connector.dbtype)
 
-        sql = Template(self.get_xml_data(dbtype=source_connector.dbtype, sql="select", identifier="tbDefinition").strip())
-        sql = sql.substitute(types_to_skip=types_to_skip, schema_filter=self.params.source_schema)
-
-        cursrc = source_connector.execute(sql)
         # Iterate to prepare statements select, insert
-        for line in cursrc:
-            row = self.strip_row(line)
+        for row in self.metadata(source_connector, "tbDefinition", types_to_skip):
 
             # skip not included cols and tables
             if not self.is_included(row[1], row[2]):
@@ -1031,26 +1304,25 @@ class ConvertorUtil:
             table_name = row[1]
 
             if (source_schema_prev, table_name_prev) != (source_schema, table_name):
-                source_schema_prev = source_schema
-                table_name_prev = table_name
-                target_schema = self.params.get_target_schema(source_schema)
-
                 if len(s) > 0:
                     insert += ")"
                     select += selfrom
-                    sqls.append((colnum, select, insert,
-                                 self.quote(table_name.strip()) if target_schema is None else self.quote(
-                                     target_schema.strip()) + '.' + self.quote(table_name.strip())))
+                    sqls.append((colnum, select, insert, target_table, selfrom,
+                                 (source_schema_prev, table_name_prev)))
+
+                source_schema_prev = source_schema
+                table_name_prev = table_name
+                target_schema = self.params.get_target_schema(source_schema)
+                columns[(source_schema, table_name)] = OrderedDict()
 
                 s = self.quote(table_name.strip()) if source_schema is None else self.quote(source_schema.strip()) + '.' + self.quote(
                     table_name.strip())
                 select = 'SELECT '
                 selfrom = ' FROM ' + s
 
-                s = self.quote(table_name.strip()) if target_schema is None else self.quote(target_schema.strip()) + '.' + self.quote(
-                    table_name.strip())
-                table_name = s
-                insert = 'INSERT INTO ' + s + ' VALUES ('
+                target_table = self.quote(table_name.strip()) if target_schema is None else self.quote(
+                    target_schema.strip()) + '.' + self.quote(table_name.strip())
+                insert = 'INSERT INTO ' + target_table + ' VALUES ('
                 colnum = 0
 
             if colnum > 0:
@@ -1059,20 +1331,25 @@ class ConvertorUtil:
 
             clname = row[2]
             tyname = row[3]
+            columns[(source_schema, table_name)][clname.strip()] = tyname.upper()
 
             (_, select_cast, insert_cast) = types_mapping[
                 tyname.upper()]  # Translate datatypes according to translation table
 
             select += select_cast
             select = select.replace('<COLNAME>', '"' + clname.strip() + '"')
-            insert += insert_cast
-            insert = insert.replace('<VALUE>', '<V' + str(colnum) + '>')
+            if self.params.executemany:
+                # Values are bound by the driver, so no quotes or literal cast around the marker
+                insert += target_connector.param_marker(colnum)
+            else:
+                insert += insert_cast
+                insert = insert.replace('<VALUE>', '<V' + str(colnum) + '>')
 
             colnum += 1
 
         insert += ")"
         select += selfrom
-        sqls.append((colnum, select, insert, table_name))
+        sqls.append((colnum, select, insert, target_table, selfrom, (source_schema, table_name)))
 
         # Run precondition script if found (e.g. this can be used to setup session authorization)
         target_schema = self.params.get_target_schema(source_schema)
@@ -1083,152 +1360,687 @@ class ConvertorUtil:
             if not self.params.trial:
                 target_connector.execute(pre_line)
 
-        self.connectors = [[source_connector, target_connector, False, 0]]
-        for index in range(1, self.params.threads):
-            source_db = dbconnector(self.params.src, True)
-            target_db = dbconnector(self.params.dest, True)
-            self.connectors.append([source_db, target_db, False, index])
+        primary_keys = {}
+        if self.params.table_chunks > 1 or (self.params.delta_columns and self.params.delta_mode == 'upsert'):
+            primary_keys = self.get_primary_keys(source_connector)
+
+        # do not record anything in trial mode
+        if not self.params.trial:
+            self.open_journal()
+        elif self.params.delta_columns:
+            self.logger.warn("--delta high-water marks are not used in trial mode: tables are copied in full")
+
+        sizes = {}
+        if self.params.schedule == 'largest' or self.params.progress_interval > 0:
+            sizes = self.get_table_sizes(source_connector)
+        scheduler = LoadScheduler(sizes, self.params.schedule == 'largest', self.params.pack_size * 1024 * 1024)
+        self.progress = LoadProgress(self.params.program_name + '_' + log_dtm_txt + '_' + log_dtm_db + '_progress.json',
+                                     self.params.progress_interval)
 
-        self.logger.info('Started loading data from tables. Thread count: ' + str(self.params.threads))
         start_time = time.time()
-        futures = []
-        pool = ThreadPoolExecutor(self.params.threads)
-        for (colnum, select, insert, table_name) in sqls:
+        # table -> its tasks, for the tables of a --delta pass
+        delta_tables = {}
+        for (colnum, select, insert, table_name, selfrom, source_table) in sqls:
             if table_name == "":
                 self.logger.warn("No table_name specified")
+                continue
+            count_loaded += 1
+            (truncate, cond, target_cond) = (True, "", "")
+            if self.journal is not None:
+                delta = self.delta_pass(source_connector, target_connector, table_name, selfrom,
+                                        columns[source_table], self.params.watermark_column(source_table[1]))
+                if delta is not None:
+                    # a catch-up pass adds rows to the target
+                    (cond, target_cond, truncate) = delta
+            table_id = self.table_key(*source_table)
+            table_keys = primary_keys.get(table_id, [])
+            (key, ranges) = (None, [])
+            if self.params.table_chunks > 1 and truncate:
+                (key, ranges) = self.get_key_ranges(source_connector, selfrom, table_keys,
+                                                    columns.get(source_table, {}))
+            key_index = None
+            if key is not None and key != "ctid":
+                key_index = list(columns[source_table]).index(key.strip('"'))
+            table_tasks = self.table_tasks(target_connector, table_name, colnum, select, insert, key, key_index,
+                                           ranges, truncate, cond, target_cond)
+            if not truncate and table_tasks and self.params.delta_mode == 'upsert':
+                self.delete_changed_rows(source_connector, target_connector, table_name, selfrom, cond, table_keys)
+            if self.journal is not None and self.journal.watermark(table_name, 'pending') is not None:
+                delta_tables[table_name] = table_tasks
+            scheduler.add(table_id, colnum, table_tasks)
+            if table_tasks:
+                # a catch-up pass copies an unknown part of the table
+                estimated_rows = sizes.get(table_id, (None, None))[0] if truncate else None
+                self.progress.add_table(table_name, len(table_tasks),
+                                        int(estimated_rows) if estimated_rows is not None and estimated_rows >= 0
+                                        else None)
+
+        tasks = scheduler.schedule()
+        try:
+            if self.params.executor == 'process':
+                self.logger.info('Started loading data from tables. Process count: ' + str(self.params.threads))
+                # the reporter thread is started once the pool is forked
+                results = self.run_process_pool(tasks)
             else:
-                count_loaded += 1
-                futures.append(pool.submit(self.copy_table_data, table_name, colnum, select, insert))
-        wait(futures)
-        for i in range(1, self.params.threads):
-            self.connectors[i][0].close()
-            self.connectors[i][1].close()
+                self.logger.info('Started loading data from tables. Thread count: ' + str(self.params.threads))
+                self.progress.start()
+                results = self.run_thread_pool(tasks)
+        finally:
+            self.progress.stop()
+        self.report_table_stats(results)
+
+        # the high-water mark of a pass is kept once every task of the table is loaded without a failed row
+        for (table_name, table_tasks) in delta_tables.items():
+            states = [self.journal.get(task[0], task[5][0]) for task in table_tasks]
+            if all(state is not None and state[0] == 'done' for state in states):
+                self.journal.commit_watermark(table_name)
+            elif [state for state in states if state is not None and state[0] == 'failed']:
+                self.logger.warn("Rows of %s failed to load: its high-water mark is not moved" % table_name)
+            else:
+                self.logger.warn("%s not completely loaded: its high-water mark is not moved" % table_name)
+
         if count_loaded > 0:
             self.logger.info("Data from all tables (%d) was loaded. Total Elapsed time: %f" %
                              (count_loaded, time.time() - start_time))
         else:
             self.logger.warn("No tables loaded. Total Elapsed time: %f" % (time.time() - start_time))
 
-
-    def load_data_vwload(self, source_connector, target_connector):
+    def open_journal(self):
         """
-            Extract data from src db and load data to dest db
-            @:param source_connector
-            @:param target_connector
+            Open the checkpoint journal of the load from @src to @dest. A new load forgets
+            the checkpoints of the previous one, --resume continues it.
         """
-        source_schema = ""
-        source_schema_prev = ""
-        table_name = ""
-        table_name_prev = ""
-        count_loaded = 0
-        insert = ""
-        select = ""
-        sqls = []
-        s = ""
-        colnum = 0
-        table_name = ""
-        selfrom = ""
-        types_mapping = typesMapping.get_types_mapping(source_connector.dbtype, target_connector.dbtype)
-        types_to_skip = typesMapping.get_unsupported_types_csv(source_connector.dbtype, target_connector.dbtype)
-
-        sql = Template(self.get_xml_data(dbtype=source_connector.dbtype, sql="select", identifier="tbDefinition").strip())
-        sql = sql.substitute(types_to_skip=types_to_skip, schema_filter=self.params.source_schema)
-
-        cursrc = source_connector.execute(sql)
-        # Iterate to prepare statements select, insert
-        for line in cursrc:
-            row = self.strip_row(line)
-
-            # skip not included cols and tables
-            if not self.is_included(row[1], row[2]):
-                continue
-
-            source_schema = row[0]
-            table_name = row[1]
+        key = (getDbStringDetails(self.params.src)[:6], getDbStringDetails(self.params.dest)[:6],
+               self.params.source_schema, self.params.target_schema)
+        fname = "%s_load_%s.journal" % (self.params.program_name, hashlib.sha1(repr(key)).hexdigest()[:16])
+        self.journal = LoadJournal(fname)
+        if self.params.resume:
+            self.logger.info("Resuming the load recorded in %s" % fname)
+        else:
+            self.journal.reset()
 
-            if (source_schema_prev, table_name_prev) != (source_schema, table_name):
-                source_schema_prev = source_schema
-                table_name_prev = table_name
-                target_schema = self.params.get_target_schema(source_schema)
+    def table_tasks(self, target_connector, table_name, colnum, select, insert, key, key_index, ranges,
+                    truncate=True, cond="", target_cond=""):
+        """
+            copy_table_data tasks of a table: one per key range of a split table, one otherwise.
+            With --resume, the tasks done by the previous run are skipped and a partially loaded range
+            of a numeric key continues after its last committed key. Other partially loaded tasks
+            are loaded again once their rows are removed from the target table. The ranges are recorded in
+            the journal: a resumed run reuses them, even if the boundaries moved since, and a table split
+            differently (another key or --chunks) is loaded again from scratch.
+            @:param key column the ranges are built on ("ctid" for Postgres pages)
+            @:param key_index position of key in the select list, None when rows can't be ordered by key
+            @:param ranges WHERE clauses from get_key_ranges
+            @:param truncate, cond, target_cond of a --delta pass (see delta_pass()), only a first pass
+                   (truncate) is split in ranges
+        """
+        journal = self.journal
+        if journal is not None and truncate:
+            stored = journal.ranges(table_name)
+            if stored is not None and len(ranges) > 1 and stored[:2] == (key, self.params.table_chunks):
+                if stored[2] != ranges:
+                    self.logger.info("%s: key ranges of the previous run reused" % table_name)
+                ranges = stored[2]
+            elif stored is not None or (len(ranges) > 1 and journal.get(table_name) is not None):
+                # the checkpoints of the previous run are for other tasks
+                self.logger.info("%s was split differently by the previous run, loading it again" % table_name)
+                self.delete_rows(target_connector, table_name, "")
+                journal.forget(table_name)
+            if len(ranges) > 1:
+                journal.set_ranges(table_name, key, self.params.table_chunks, ranges)
+        if len(ranges) <= 1:
+            state = journal.get(table_name) if journal is not None else None
+            if state is not None and state[0] == 'done':
+                self.logger.info("%s already loaded (%d rows). Skipping..." % (table_name, state[1]))
+                return []
+            if state is not None:
+                self.logger.info("%s partially loaded (%d rows), loading it again" % (table_name, state[1]))
+                self.delete_rows(target_connector, table_name, target_cond)
+            return [(table_name, colnum, select + cond, insert, truncate, ('', None, 0))]
+
+        states = {}
+        if journal is not None:
+            for where in ranges:
+                state = journal.get(table_name, where)
+                if state is not None:
+                    states[where] = state
+        if key_index is None and [state for state in states.values() if state[0] != 'done']:
+            # the rows of a page range are not known on the target: load the whole table again
+            self.logger.info("%s partially loaded, loading it again" % table_name)
+            self.delete_rows(target_connector, table_name, "")
+            journal.forget(table_name)
+            states = {}
+        if not states:
+            # every range is copied by its own worker: truncate once before any of them starts
+            self.truncate_table(target_connector, table_name)
+        self.logger.info("%s is split in %d ranges" % (table_name, len(ranges)))
+
+        # rows of a range are read in key order so that its last committed key is a checkpoint
+        order = "" if key_index is None else " ORDER BY " + key
+        # high-water mark of a first --delta pass
+        bound = cond.replace(" WHERE ", " AND ", 1)
+        target_key = self.quote(key.strip('"'))
+        tasks = []
+        for where in ranges:
+            state = states.get(where)
+            if state is None:
+                tasks.append((table_name, colnum, select + where + bound + order, insert, False,
+                              (where, key_index, 0)))
+            elif state[0] == 'done':
+                self.logger.info("%s%s already loaded (%d rows). Skipping..." % (table_name, where, state[1]))
+            else:
+                (_, rows, last_key) = state
+                rest = where
+                if last_key is None:
+                    rows = 0
+                else:
+                    rest += " AND %s > %s" % (key, last_key)
+                # rows committed after the last checkpoint
+                self.delete_rows(target_connector, table_name, rest.replace(key, target_key))
+                self.logger.info("%s%s partially loaded (%d rows), continuing" % (table_name, where, rows))
+                tasks.append((table_name, colnum, select + rest + bound + order, insert, False,
+                              (where, key_index, rows)))
+        return tasks
+
+    def delta_pass(self, source_connector, target_connector, table_name, selfrom, table_columns, column):
+        """
+            --delta: bound the copy of a table to the rows whose watermark column is above the high-water
+            mark stored by the previous pass and not above the current maximum, kept as the pending
+            high-water mark until the table is loaded (a resumed pass reuses it).
+            @:param table_columns {column name: source datatype} of the table
+            @:param column watermark column given by --delta, None to copy the table in full
+            @:return: (source condition, target condition, truncate): the first pass copies the whole table
+                      up to the pending mark into the truncated table; None when the table is copied in full
+        """
+        journal = self.journal
+        if column is None:
+            if journal.watermark(table_name) is not None:
+                # a full copy makes the stored high-water mark meaningless
+                self.logger.info("%s is copied in full, forgetting its high-water mark" % table_name)
+                journal.forget_watermark(table_name)
+            return None
+        matches = [c for c in table_columns if c.upper() == column.upper()]
+        if not matches:
+            self.logger.warn("%s has no watermark column %s: copied in full" % (table_name, column))
+            return self.delta_pass(source_connector, target_connector, table_name, selfrom, table_columns, None)
+        column = matches[0]
+
+        pending = journal.watermark(table_name, 'pending')
+        if pending is None or pending[0] != column:
+            cur = source_connector.execute('SELECT MAX("%s")%s' % (column, selfrom))
+            high = None
+            if cur is not None:
+                for (high,) in cur:
+                    pass
+            if high is None:
+                journal.forget_watermark(table_name)
+                return ("", "", True)
+            (kind, value) = self.watermark_value(high)
+            journal.set_watermark(table_name, column, kind, value, 'pending')
+            pending = (column, kind, value)
+
+        stored = journal.watermark(table_name)
+        first = stored is None or stored[0] != column
+        if first:
+            # rows changed during the copy are above the mark: the next pass takes them
+            self.logger.info("%s: first --delta pass, copying rows up to %s = %s" % (table_name, column, pending[2]))
+        else:
+            self.logger.info("%s: copying rows with %s in (%s, %s]" % (table_name, column, stored[2], pending[2]))
+        conds = []
+        for (dbtype, name) in ((source_connector.dbtype, '"%s"' % column),
+                               (target_connector.dbtype, self.quote(column))):
+            cond = " WHERE %s <= %s" % (name, self.watermark_literal(dbtype, pending[1], pending[2]))
+            if not first:
+                cond += " AND %s > %s" % (name, self.watermark_literal(dbtype, stored[1], stored[2]))
+            conds.append(cond)
+        return (conds[0], conds[1], first)
+
+    @staticmethod
+    def watermark_value(value):
+        """
+            @:return: (kind, text) of a watermark column value as kept in the load journal
+        """
+        if isinstance(value, float):
+            # repr keeps all the significant digits, str rounds to 12: a rounded bound drops or repeats rows
+            return ('number', repr(value))
+        if isinstance(value, (int, long, Decimal)):
+            return ('number', str(value))
+        if isinstance(value, datetime):
+            return ('timestamp', value.isoformat(' '))
+        if isinstance(value, date):
+            return ('date', value.isoformat())
+        if isinstance(value, str):
+            return ('text', value.decode('utf-8', 'ignore'))
+        return ('text', unicode(value))
+
+    @staticmethod
+    def watermark_literal(dbtype, kind, value):
+        """
+            SQL literal of a high-water mark kept in the load journal
+        """
+        if kind == 'number':
+            return value
+        literal = "'%s'" % value.replace("'", "''")
+        if kind == 'timestamp' and dbtype == 'mssql':
+            # microseconds: a DATETIME literal takes 3 fractional digits at most
+            return "CONVERT(DATETIME2, %s, 121)" % literal
+        if kind in ('timestamp', 'date') and dbtype not in ('mssql', 'sqlite'):
+            return "%s %s" % (kind.upper(), literal)
+        return literal
+
+    def delete_changed_rows(self, source_connector, target_connector, table_name, selfrom, cond, key_columns):
+        """
+            --deltamode upsert: remove from the target the previous version of the rows changed since the
+            last pass, identified by their primary key, so that the pass replaces them
+            @:param cond source condition of the pass (see delta_pass())
+            @:param key_columns primary key columns of the table
+        """
+        if not key_columns:
+            self.logger.warn("%s has no primary key: changed rows are appended" % table_name)
+            return
+        select = "SELECT %s%s%s" % (",".join('"%s"' % c for c in key_columns), selfrom, cond)
+        delete = "DELETE FROM %s WHERE %s" % (table_name, " AND ".join(
+            "%s = %s" % (self.quote(c), target_connector.param_marker(i)) for (i, c) in enumerate(key_columns)))
+        self.logger.debug(select)
+        t1 = time.time()
+        count = 0
+        keys = []
+        try:
+            for line in source_connector.stream(select, self.params.arraysize):
+                keys.append(self.strip_row(line))
+                if len(keys) >= self.params.batchsize:
+                    count += len(keys)
+                    self.delete_keys(target_connector, delete, keys)
+                    keys = []
+            if keys:
+                count += len(keys)
+                self.delete_keys(target_connector, delete, keys)
+        except Exception as ex:
+            self.logger.error("Failed to remove the changed rows of " + table_name)
+            self.handle_error(ex)
+        self.logger.info("%s: %d changed row(s) to replace - Elapsed time(s): %f" % (
+            table_name, count, time.time() - t1))
 
-                if len(s) > 0:
-                    insert += ")"
-                    select += selfrom
-                    sqls.append((colnum, select, insert,
-                                 self.quote(table_name.strip()) if target_schema is None else self.quote(
-                                     target_schema.strip()) + '.' + self.quote(table_name.strip())))
+    def delete_keys(self, target_connector, delete, keys):
+        # do not alter DB in trial mode
+        if not self.params.trial:
+            target_connector.executemany(delete, keys)
+            target_connector.commit()
 
-                s = self.quote(table_name.strip()) if source_schema is None else self.quote(source_schema.strip()) + '.' + self.quote(
-                    table_name.strip())
-                select = 'SELECT '
-                selfrom = ' FROM ' + s
+    def delete_rows(self, target_connector, table_name, where):
+        """
+            Remove rows of a partially loaded table or key range before loading them again (--resume)
+        """
+        # do not alter DB in trial mode
+        if not self.params.trial:
+            self.logger.info("Removing rows of %s%s" % (table_name, where))
+            target_connector.execute("DELETE FROM %s%s" % (table_name, where))
+            target_connector.commit()
 
-                s = self.quote(table_name.strip()) if target_schema is None else self.quote(target_schema.strip()) + '.' + self.quote(
-                    table_name.strip())
-                table_name = s
-                insert = 'COPY ' + s + '() VWLOAD  '
-                attribs = 'WITH ATTRIBUTES='''
-                colnum = 0
+    def run_thread_pool(self, tasks):
+        """
+            Run copy_tables for every work item on --threads threads, each checking out
+            its own connectors from the pool
+            @:param tasks work items from LoadScheduler.schedule(), in submission order
+            @:return: list of copy_table_data results
+        """
+        futures = []
+        pool = ThreadPoolExecutor(self.params.threads)
+        for item in tasks:
+            futures.append(pool.submit(self.copy_tables, item))
+        wait(futures)
+        return [result for f in futures if f.exception() is None for result in f.result()]
 
-            if colnum > 0:
-                insert += ","
-                select += ","
+    def run_process_pool(self, tasks):
+        """
+            Run copy_tables for every work item in --threads processes (--executor process).
+            Row conversion is not serialized by the GIL. The pool is forked after
+            _process_util is set, so the workers share inserted_queries_number (--maxrows)
+            and open their own source and target connections in _init_process_worker.
+            The progress reporter starts after the fork: a worker forked while the reporter
+            thread holds the lock of a progress counter would wait for it forever.
+            @:param tasks work items from LoadScheduler.schedule(), in submission order
+            @:return: list of copy_table_data results
+        """
+        global _process_util
+        _process_util = self
+        pool = multiprocessing.Pool(self.params.threads, _init_process_worker)
+        if self.progress is not None:
+            self.progress.start()
+        try:
+            results = pool.map(_copy_tables_worker, tasks, 1)
+        finally:
+            pool.close()
+            pool.join()
+            _process_util = None
+        return [result for item in results for result in item]
 
-            clname = row[2]
-            tyname = row[3]
+    def copy_tables(self, tasks):
+        """
+            Run the copy_table_data tasks of a work item one after the other
+        """
+        results = []
+        for task in tasks:
+            try:
+                if self.profiler is not None and self.profiler.tasks:
+                    results.append(self.profiler.run(self.profiler.task_name(task[0]), self.copy_table_data, *task))
+                else:
+                    results.append(self.copy_table_data(*task))
+            except SystemExit:
+                # handle_error() exits on error: go on with the other tasks of the item
+                results.append(None)
+        return results
 
-            (_, select_cast, insert_cast) = types_mapping[
-                tyname.upper()]  # Translate datatypes according to translation table
+    def get_table_sizes(self, source_connector):
+        """
+            Read the catalog statistics of the source tables from the tbSize query
+            @:param source_connector
+            @:return: {table_key(schema, table): (rows, bytes)}, None when unknown
+        """
+        result = {}
+        try:
+            if self.definition_sql(source_connector.dbtype, "tbSize").strip() == "":
+                self.logger.info("No table size statistics for %s, tables are loaded in catalog order"
+                                 % source_connector.dbtype)
+                return result
+            for row in self.metadata(source_connector, "tbSize"):
+                result[self.table_key(row[0], row[1])] = (row[2], row[3])
+        except Exception as ex:
+            # statistics only order the tables: e.g. a catalog view not granted must not stop the load
+            self.logger.warn("Table sizes not available, tables are loaded in catalog order: %s" % ex)
+            return {}
+        return result
 
-            select += select_cast
-            select = select.replace('<COLNAME>', '"' + clname.strip() + '"')
-            insert += insert_cast
-            insert = insert.replace('<VALUE>', '<V' + str(colnum) + '>')
+    def report_table_stats(self, results):
+        """
+            Log rows and times per table, summing the ranges of split tables
+            @:param results list of (table_name, rows, elapsed, insert_time, size, {stage: seconds}, worker,
+                    rows not encoded) from copy_table_data
+        """
+        tables = {}
+        for result in results:
+            if not isinstance(result, tuple):
+                continue
+            (table_name, rows, elapsed, insert_time, sz, timings, worker, skipped) = result
+            self.report.add_task('load', table_name, worker, rows, sz, elapsed, dict(timings, insert=insert_time))
+            stats = tables.setdefault(table_name, [0, 0, 0.0, 0.0, 0.0, 0])
+            stats[0] += 1
+            stats[1] += rows
+            stats[2] = max(stats[2], elapsed)
+            stats[3] += insert_time
+            stats[4] += sz
+            stats[5] += skipped
+        for table_name in sorted(tables):
+            (parts, rows, elapsed, insert_time, sz, skipped) = tables[table_name]
+            message = "Rows inserted into %s: %d (%d part(s)) - Elapsed time(s): %f (total insert time: %f)" \
+                      " - Estimated size(MB): %f" % (table_name, rows, parts, elapsed, insert_time, sz / 1024 / 1024)
+            if skipped:
+                self.logger.warn(message + " - Rows not encoded: %d" % skipped)
+            else:
+                self.logger.info(message)
 
-            colnum += 1
+    def get_primary_keys(self, source_connector):
+        """
+            Read the primary keys of the source tables from the ukDefinition query
+            @:param source_connector
+            @:return: {table_key(schema, table): [column, ...]}
+        """
+        result = {}
+        try:
+            rows = self.metadata(source_connector, "ukDefinition")
+        except ValueError as ex:
+            self.logger.warn(ex)
+            return result
+        for row in rows:
+            if row[3] is not None and row[3].upper() == 'PRIMARY KEY':
+                result.setdefault(self.table_key(row[0], row[1]), []).append(row[4])
+        return result
 
-        insert += ")"
-        select += selfrom
-        sqls.append((colnum, select, insert, table_name))
+    @staticmethod
+    def table_key(schema, table):
+        """
+            Catalog queries do not agree on the case of the names (e.g. the Oracle ukDefinition lower-cases
+            the schema): tables are matched on their upper-cased names
+            @:return: (schema, table) upper-cased
+        """
+        return tuple(None if name is None else name.upper() for name in (schema, table))
 
-        # Run precondition script if found (e.g. this can be used to setup session authorization)
-        target_schema = self.params.get_target_schema(source_schema)
-        pres = self.get_xml_data(dbtype=target_connector.dbtype, sql="create", identifier="pre")
-        pre = Template(pres).substitute(scname=self.quote(target_schema), insert_mode=self.params.insert_mode)
-        for pre_line in pre.split(';'):
+    def get_key_ranges(self, source_connector, selfrom, key_columns, table_columns):
+        """
+            Split a table in --chunks ranges of its numeric single column primary key (MIN/MAX or NTILE
+            boundaries, see --chunkmethod) or, for Postgres tables without one, of its ctid pages.
+            @:param source_connector
+            @:param selfrom FROM clause of the table
+            @:param key_columns primary key columns of the table
+            @:param table_columns {column name: source datatype} of the table
+            @:return: (key, list of WHERE clauses on key covering the whole table), no clauses if the
+                      table can't be split
+        """
+        count = self.params.table_chunks
+        key = None
+        boundaries = []
+        try:
+            if len(key_columns) == 1 and \
+                    table_columns.get(key_columns[0], '').split('(')[0].strip() in numeric_key_types:
+                key = '"' + key_columns[0] + '"'
+                if self.params.chunk_method == 'ntile':
+                    cur = source_connector.execute(
+                        "SELECT MIN(%s) FROM (SELECT %s, NTILE(%d) OVER (ORDER BY %s) AS dbmv_tile %s) dbmv_tiles"
+                        " GROUP BY dbmv_tile ORDER BY 1" % (key, key, count, key, selfrom))
+                    boundaries = [line[0] for line in cur][1:]
+                else:
+                    cur = source_connector.execute("SELECT MIN(%s), MAX(%s) %s" % (key, key, selfrom))
+                    for (low, high) in cur:
+                        if low is not None and high is not None:
+                            low = int(low)
+                            step = float(int(high) - low) / count
+                            boundaries = sorted(set(int(low + step * i) for i in range(1, count)
+                                                    if int(low + step * i) > low))
+            elif source_connector.dbtype == "postgres" and source_connector.driver is None:
+                key = "ctid"
+                cur = source_connector.execute("SELECT relpages FROM pg_class WHERE oid = '%s'::regclass"
+                                               % selfrom.replace(' FROM ', '', 1).replace("'", "''"))
+                for (pages,) in cur:
+                    step = float(pages) / count
+                    boundaries = ["'(%d,0)'::tid" % page for page in
+                                  sorted(set(int(step * i) for i in range(1, count) if int(step * i) > 0))]
+        except Exception as ex:
+            self.logger.warn("Can't split%s in ranges: %s" % (selfrom, ex))
+            boundaries = []
+
+        if not boundaries:
+            return (None, [])
+        ranges = [" WHERE %s < %s" % (key, boundaries[0])]
+        for i in range(1, len(boundaries)):
+            ranges.append(" WHERE %s >= %s AND %s < %s" % (key, boundaries[i - 1], key, boundaries[i]))
+        ranges.append(" WHERE %s >= %s" % (key, boundaries[-1]))
+        return (key, ranges)
+
+    def truncate_table(self, target_connector, table_name):
+        """
+            If truncate was specified remove existing rows from the destination table.
+        """
+        if self.params.truncate and table_name != '':
             # do not alter DB in trial mode
             if not self.params.trial:
-                target_connector.execute(pre_line)
+                self.logger.info("Truncating " + table_name)
+                target_connector.execute('MODIFY %s TO TRUNCATED' % table_name)
 
-        self.connectors = [[source_connector, target_connector, False, 0]]
-        for index in range(1, self.params.threads):
-            source_db = dbconnector(self.params.src, True)
-            target_db = dbconnector(self.params.dest, True)
-            self.connectors.append([source_db, target_db, False, index])
+    def load_data_vwload(self, source_connector, target_connector):
+        """
+            Extract data from src db to delimited files and load every file into dest db
+            with the bulk loader of the target (vwload command or COPY VWLOAD statement)
+            @:param source_connector
+            @:param target_connector
+        """
+        count_loaded = 0
+        sqls = self.prepare_unload_sqls(source_connector, target_connector.dbtype)
+
+        if self.params.load_cpvwl:
+            loader = self.get_xml_data(dbtype=target_connector.dbtype, sql="load", identifier="cpvwl").strip()
+        else:
+            loader = self.get_xml_data(dbtype=target_connector.dbtype, sql="load", identifier="cmd").strip()
+        if loader == "":
+            self.logger.error("No bulk load definition found for target '%s'" % target_connector.dbtype)
+            return
 
-        self.logger.info('Started loading data from tables. Thread count: ' + str(self.params.threads))
+        self.logger.info('Started bulk loading data from tables. Thread count: ' + str(self.params.threads))
         start_time = time.time()
         futures = []
         pool = ThreadPoolExecutor(self.params.threads)
-        for (colnum, select, insert, table_name) in sqls:
+        for (fname, colnum, select, insert, target_schema, table_name, _) in sqls:
             if table_name == "":
                 self.logger.warn("No table_name specified")
             else:
                 count_loaded += 1
-                futures.append(pool.submit(self.copy_table_data, table_name, colnum, select, insert))
+                futures.append(pool.submit(self.bulk_load_table, loader, fname, colnum, select, insert,
+                                           target_schema, table_name))
         wait(futures)
-        for i in range(1, self.params.threads):
-            self.connectors[i][0].close()
-            self.connectors[i][1].close()
+
+        failed = [f for f in futures if f.result() is False]
         if count_loaded > 0:
-            self.logger.info("Data load attempted for (%d) tables. Please verifiy what was loaded. Total Elapsed time: %f" %
-                             (count_loaded, time.time() - start_time))
+            self.logger.info("Data bulk load attempted for (%d) tables, %d failed verification. Total Elapsed time: %f" %
+                             (count_loaded, len(failed), time.time() - start_time))
         else:
             self.logger.warn("No tables loaded. Total Elapsed time: %f" % (time.time() - start_time))
 
-    def insert_sql(self, db, sql):
+    def bulk_load_table(self, loader, fname, colnum, select, insert, target_schema, table_name):
+        """
+            Unload one table to fname and run the bulk loader on it, into the table truncated first with
+            --truncate as load_data does. Returns True when the rows added to the target match the
+            extracted rows, None in trial mode
+        """
+        connector = None
+        result = False
+        try:
+            connector = self.pool.checkout()
+            source_connector = connector[0]
+            target_connector = connector[1]
+            target_table = self.quote(table_name) if target_schema is None else \
+                self.quote(target_schema) + '.' + self.quote(table_name)
+
+            fname = os.path.abspath(fname)
+            errfile = fname + '.err'
+            files = []
+            if self.params.load_cpvwl:
+                attrib = "LOG='%s', ERROR_COUNT=%d" % (errfile, 2147483647 if self.params.continue_on_error else 1)
+            else:
+                attrib = '--log "%s" --errorcount %d --parallelism %d' % (
+                    errfile, 2147483647 if self.params.continue_on_error else 1, self.params.load_parallelism)
+            cmd = self.bulk_load_command(loader, target_schema, table_name, [fname], attrib)
+            self.logger.debug("[Thread #%d] %s" % (connector[2], cmd))
+
+            t1 = time.time()
+            # do not alter DB in trial mode: the data is only written to fname
+            if self.params.trial:
+                self.write_table_file(source_connector, fname, colnum, select, insert)
+                return None
+
+            self.truncate_table(target_connector, target_table)
+            rows_before = self.count_rows(target_connector, target_table)
+            writer = None
+            extracted = []
+            if self.params.use_fifo:
+                # The loader reads the pipe while the source is still being extracted
+                if os.path.exists(fname):
+                    os.remove(fname)
+                os.mkfifo(fname)
+                writer = Thread(target=lambda: extracted.append(
+                    self.write_table_file(source_connector, fname, colnum, select, insert)))
+                writer.start()
+            else:
+                extracted.append(self.write_table_file(source_connector, fname, colnum, select, insert, files))
+                if files and files != [fname]:
+                    # --splitsize: the loader reads the chunks of the table in parallel
+                    cmd = self.bulk_load_command(loader, target_schema, table_name, files, attrib)
+                    self.logger.debug("[Thread #%d] %s" % (connector[2], cmd))
+            t2 = time.time()
+
+            try:
+                if self.params.load_cpvwl:
+                    for stmt in cmd.split(';'):
+                        if stmt.strip() != "":
+                            target_connector.execute(stmt)
+                    target_connector.commit()
+                else:
+                    proc = subprocess.Popen(shlex.split(cmd.encode('utf-8')), stdout=subprocess.PIPE,
+                                            stderr=subprocess.STDOUT)
+                    output = proc.communicate()[0]
+                    if proc.returncode != 0:
+                        self.logger.error("[Thread #%d] vwload returned %d for %s:\n%s" % (
+                            connector[2], proc.returncode, target_table, output))
+                    else:
+                        self.logger.debug(output)
+            finally:
+                if writer is not None:
+                    self.release_fifo(fname, writer)
+            rows_extracted = extracted[0] if extracted else -1
+            t3 = time.time()
+
+            # rows already in the target (no --truncate, or a catch-up load) are not loaded ones
+            rows_loaded = self.count_rows(target_connector, target_table)
+            if rows_loaded >= 0 and rows_before >= 0:
+                rows_loaded -= rows_before
+            result = rows_loaded == rows_extracted
+            if result:
+                self.logger.info("[Thread #%d] Bulk loaded %s: %d rows - Extract time(s): %f - Load time(s): %f"
+                                 " - Parallelism: %d - Error file: %s" % (
+                                     connector[2], target_table, rows_loaded, t2 - t1, t3 - t2,
+                                     self.params.load_parallelism, errfile))
+            else:
+                self.logger.warn("[Thread #%d] Row count mismatch for %s: %d rows extracted, %d rows loaded."
+                                 " Check error file %s" % (connector[2], target_table, rows_extracted, rows_loaded,
+                                                           errfile))
+        except Exception as ex:
+            self.logger.error("Failed to bulk load data for table '" + table_name + "'.")
+            self.handle_error(ex)
+        finally:
+            if connector is not None:
+                self.pool.checkin(connector)
+        return result
+
+    @staticmethod
+    def count_rows(target_connector, target_table):
+        """
+            @:return: rows of a target table, -1 when they can't be counted
+        """
+        rows = -1
+        cur = target_connector.execute("SELECT COUNT(*) FROM " + target_table)
+        if cur is not None:
+            for line in cur:
+                rows = line[0]
+        return rows
+
+    def bulk_load_command(self, loader, target_schema, table_name, files, attrib):
+        """
+            vwload command or COPY VWLOAD statements loading the files of a table
+        """
+        if self.params.load_cpvwl:
+            # FROM 'file1', 'file2'
+            fname = "', '".join(files)
+        else:
+            fname = " ".join(files)
+        return Template(loader).substitute(scname=target_schema, tbname=table_name,
+                                           fdelim=self.params.fdelim, fname=fname,
+                                           dbname=getDbStringDetails(self.params.dest)[4],
+                                           attrib=attrib, attribsep=',', wdname=os.getcwd())
+
+    def release_fifo(self, fname, writer):
+        """
+            Wait for the writer of the named pipe fname and remove the pipe.
+            When the loader exited without opening the pipe, the writer is still blocked
+            in open(): open the read end once so that it gets a broken pipe and stops.
+        """
+        if writer.is_alive():
+            fd = os.open(fname, os.O_RDONLY | os.O_NONBLOCK)
+            os.close(fd)
+        writer.join()
+        os.remove(fname)
+
+    def insert_sql(self, db, sql, commit=True):
         """
             call db sql script with exception wrap
+            @:param commit False when the transaction is committed by the caller (see TransactionControl)
         """
         try:  # Execute INSERT
             with warnings.catch_warnings(record=True) as w:
@@ -1237,8 +2049,12 @@ class ConvertorUtil:
 
                 # do not alter DB in trial mode
                 if not self.params.trial:
-                    db.execute(sql)
-                    db.commit()
+                    # not db.execute(), which only logs an error: the batch would count as inserted and,
+                    # in a TransactionControl transaction, would not be rolled back (on Postgres every
+                    # later statement of the transaction fails too)
+                    db.cursor.execute(sql)
+                    if commit:
+                        db.commit()
 
                 if len(w) > 0:
                     self.logger.debug(sql)
@@ -1251,14 +2067,38 @@ class ConvertorUtil:
             pass
         return 0
 
-    def copy_table_data(self, table_name, column_count, select, insert):
+    def insert_many(self, db, sql, rows, commit=True):
+        """
+            call db parameterized sql for a batch of rows with exception wrap
+            @:param commit False when the transaction is committed by the caller (see TransactionControl)
+        """
+        try:  # Execute INSERT
+            # do not alter DB in trial mode
+            if not self.params.trial:
+                db.executemany(sql, rows)
+                if commit:
+                    db.commit()
+            return 1
+        except Exception as ex:
+            self.logger.warn('Error: Failed to insert data into target DB')
+            self.handle_error(ex)
+        return 0
+
+    def copy_table_data(self, table_name, column_count, select, insert, truncate=True, checkpoint=None):
+        """
+            Copy the rows of select into table_name in batches of --batchsize rows. With --pipeline the
+            batches are fetched and encoded by a reader thread (see BatchPipeline) while this one inserts.
+            @:param checkpoint (chunk, key_index, rows) of the task in the load journal: committed
+                    batches are recorded with the rows loaded so far and, when the rows are read in
+                    key order, the key of the last row (column key_index of select). Once a batch
+                    failed (--on_error continue) the checkpoint stays before its rows and the task is
+                    not complete, so that --resume loads them again.
+        """
+        connector = None
+        transaction = None
+        pipeline = None
         try:
-            connector = None
-            for conn in self.connectors:
-                if not conn[2]:
-                    conn[2] = True
-                    connector = conn
-                    break
+            connector = self.pool.checkout()
             source_connector = connector[0]
             target_connector = connector[1]
             if table_name == '':
@@ -1267,101 +2107,215 @@ class ConvertorUtil:
                 self.logger.debug(table_name)
 
             self.logger.debug(select)
-            cursrc = source_connector.execute(select)
+            cursrc = source_connector.stream(select, self.params.arraysize)
 
             counter = 0
-            currentCounter = 0
-            inserts = []
 
-            ## self.logger.debug("[Thread #%d] Loading..." % (connector[3]))
-            self.logger.debug("[Thread #%d] Loading... %s" % (connector[3] , table_name))
+            ## self.logger.debug("[Thread #%d] Loading..." % (connector[2]))
+            self.logger.debug("[Thread #%d] Loading... %s" % (connector[2] , table_name))
             sz = 0.0
             t1 = time.time()
 
-            # If truncate was specified remove existing rows from the destination table.
-            if self.params.truncate and table_name != '':
-                # do not alter DB in trial mode
-                if not self.params.trial:
-                    self.logger.info( "Running in Trial Mode for " + table_name )
-                    target_connector.execute('MODIFY %s TO TRUNCATED' % table_name)
+            if truncate:
+                self.truncate_table(target_connector, table_name)
+
+            journal = None
+            key_index = None
+            if self.journal is not None and checkpoint is not None:
+                journal = self.journal
+                (chunk, key_index, rows_before) = checkpoint
+                if rows_before == 0:
+                    journal.start(table_name, chunk)
+            # rows and key of the last commit, before any failed batch
+            (committed, last_key) = (0, None)
+            complete = True
+            failed = False
+            progress = self.progress
+            params = self.params
+            transaction = TransactionControl(target_connector, params.commit_rows, params.commit_seconds,
+                                             (params.commit_rows or params.commit_seconds or params.commit_table)
+                                             and not params.trial)
+            autocommit = not transaction.explicit
+
+            encoders = None
+            if not self.params.executemany:
+                encoders = (RowEncoder(insert, 'NULL'), RowEncoder(insert[insert.index("VALUES") + 6:], 'NULL'))
+            timings = {'fetch': 0.0, 'encode': 0.0}
+            sizer = BatchSizer(self.params.statement_size * 1024) if self.params.batch_adaptive else None
+            batches = self.read_batches(cursrc, encoders, key_index, timings, sizer)
+            if self.params.pipeline_depth > 0:
+                pipeline = BatchPipeline(batches, self.params.pipeline_depth)
+                batches = pipeline
 
             insert_time = 0
             batch_start = time.time()
-            is_first_insert = True
-            for line in cursrc:  # Read source cursor (SELECT)
-                row = self.strip_row(line)
-                s = insert
-                for i in range(0, column_count):  # Prepare INSERT
-                    value = row[i]
-                    if value is None:  # When Null
-                        s = s.replace("'<V" + str(i) + ">'", 'NULL')  # Replace NULL value for strings and dates
-                        s = s.replace("<V" + str(i) + ">", 'NULL')  # Replace NULL value for integers or floats
-                        sz += 1
-                    elif type(value) == unicode:  # When  string (unicode)
-                        value = value.replace("'", "''")  # Replace simple ' by '' in insert command
-                        s = s.replace("<V" + unicode(str(i), 'utf-8') + ">", value)
-                        sz += len(value)
-                    else:  # When not string
-                        try:
-                            s = s.replace("<V" + str(i) + ">", str(value))
-                            sz += len(str(value))  # Not right but gives an idea of the size of numbers
-                        except UnicodeDecodeError:  # String has an unknown character
-                            self.logger.error("UnicodeDecodeError for column <%d> value = %s" % (i, value))
-                            value = value.replace("'", "''")  # Replace simple ' by '' in insert command
-                            s = s.replace("<V" + str(i) + ">", unicode(value, 'utf-8', 'ignore'))
-                            sz += len(value)
-                            self.logger.debug("- Resulting DML : %s " % s)
-                        finally:
-                            pass
-                if is_first_insert:
-                    inserts.append(s)
-                    is_first_insert = False
+            # key of the last row of the last batch inserted in full
+            inserted_key = None
+            # rows that can't be encoded
+            skipped = 0
+            for (rows, batch_sz, batch_key, batch_skipped) in batches:
+                if batch_skipped:
+                    # the checkpoint stays before the batch, like for a failed one
+                    skipped += batch_skipped
+                    (complete, failed) = (False, True)
+                if not rows:
+                    continue
+                if self.__is_reached_insertion_limit(connector[2]):
+                    complete = False
+                    break
+                # other tasks may reach --maxrows after the check above
+                room = max(self.params.maxrows - self.inserted_queries_number.get(), 0)
+                if room == 0:
+                    complete = False
+                    break
+                limited = len(rows) > room
+                if limited:
+                    # the batch was read before the other tasks reached --maxrows
+                    batch_sz = batch_sz * room / len(rows)
+                    rows = rows[:room]
+                    complete = False
+
+                insert_start = time.time()
+                if self.params.executemany:
+                    currentCounter = len(rows) * self.insert_many(target_connector, insert, rows, autocommit)
+                else:
+                    # Values of the rows after the first one only, e.g. ('<V0>','<V1>',<V2>)
+                    currentCounter = len(rows) * self.insert_sql(target_connector, ",".join(rows), autocommit)
+                (rolled_back, rolled_back_sz) = (0, 0.0)
+                if currentCounter == 0:
+                    # the rows not committed yet are lost with the failed batch
+                    (rolled_back, rolled_back_sz) = transaction.rollback()
+                    counter -= rolled_back
+                    sz -= rolled_back_sz
+                    (complete, failed) = (False, True)
                 else:
-                    # Get the string after VAULES, e.g. ('<V0>','<V1>',<V2>)
-                    s = s.encode("utf-8")
-                    values = s[s.index("VALUES") + 6:]
-                    inserts.append(values)
-                    currentCounter = len(inserts)
-
-                if (currentCounter >= self.params.batchsize) or \
-                        (currentCounter + self.inserted_queries_number.get()) >= self.params.maxrows:
-                    if self.__is_reached_insertion_limit(connector[3]):
-                        # prevent any inserts
-                        currentCounter = 0
-                        inserts = []
-                        break
-
-                    insert_start = time.time()
-                    currentCounter *= self.insert_sql(target_connector, ",".join(inserts))
                     counter += currentCounter
-                    inserts = []
-                    t2 = time.time()
-                    insert_time += t2 - insert_start
-                    self.logger.debug(
-                        "[Thread #%d] Batch inserted: %d - Elapsed time(s): %f (insert time: %f), - Estimated size(MB): %f\n" % (
-                            connector[3], currentCounter, t2 - batch_start, t2 - insert_start, sz / 1024 / 1024))
+                    sz += batch_sz
+                    if not limited:
+                        inserted_key = batch_key
+                if currentCounter > 0 and transaction.batch(currentCounter, batch_sz) and not failed:
+                    (committed, last_key) = (counter, inserted_key)
+                    if journal is not None:
+                        journal.progress(table_name, chunk, rows_before + committed, last_key)
+                t2 = time.time()
+                insert_time += t2 - insert_start
+                if sizer is not None and currentCounter > 0:
+                    sizer.update(len(rows), batch_sz, t2 - insert_start)
+                self.logger.debug(
+                    "[Thread #%d] Batch inserted: %d - Elapsed time(s): %f (insert time: %f), - Estimated size(MB): %f\n" % (
+                        connector[2], currentCounter, t2 - batch_start, t2 - insert_start, sz / 1024 / 1024))
+                if currentCounter > 0:
                     self.inserted_queries_number.add(currentCounter)
-                    currentCounter = 0
-                    is_first_insert = True
-
-                    if self.__is_reached_insertion_limit(connector[3]):
-                        break
+                    if progress is not None:
+                        progress.update(table_name, currentCounter, batch_sz)
+                elif rolled_back > 0:
+                    # they were accounted when inserted
+                    self.inserted_queries_number.add(-rolled_back)
+                    if progress is not None:
+                        progress.update(table_name, -rolled_back, -rolled_back_sz)
+                if limited:
+                    break
 
-            if currentCounter > 0:
-                insert_start = time.time()
-                counter += currentCounter * self.insert_sql(target_connector, ",".join(inserts))
-                insert_time += time.time() - insert_start
+            if pipeline is not None:
+                pipeline.close()
+            insert_start = time.time()
+            transaction.end()
+            insert_time += time.time() - insert_start
+            if not failed:
+                # the rows of the last batches are committed by end()
+                (committed, last_key) = (counter, inserted_key)
+            if journal is not None:
+                if complete:
+                    journal.done(table_name, chunk, rows_before + counter)
+                elif failed:
+                    journal.fail(table_name, chunk, rows_before + committed, last_key)
+                else:
+                    journal.progress(table_name, chunk, rows_before + committed, last_key)
 
             t2 = time.time()
+            if sizer is not None:
+                self.logger.debug("[Thread #%d] Batch size of %s: %d rows" % (connector[2], table_name, sizer.rows))
             self.logger.debug(
                 "[Thread #%d] Total Rows inserted into %s: %d - Elapsed time(s): %f (total insert time: %f), - Estimated size(MB): %f\n" % (
-                    connector[3],table_name, counter, t2 - t1, insert_time, sz / 1024 / 1024))
+                    connector[2],table_name, counter, t2 - t1, insert_time, sz / 1024 / 1024))
+            if skipped:
+                self.logger.warn("[Thread #%d] %d row(s) of %s could not be encoded and were not loaded" % (
+                    connector[2], skipped, table_name))
+            return (table_name, counter, t2 - t1, insert_time, sz, timings, "%d.%d" % (os.getpid(), connector[2]),
+                    skipped)
         except Exception as ex:
             self.logger.error("Failed to copy data for table'" + table_name + "'.")
             self.handle_error(ex)
         finally:
-            connector[2] = False
-            pass
+            if pipeline is not None:
+                pipeline.close()
+            if transaction is not None:
+                # the task failed: the connector goes back to the pool in autocommit
+                try:
+                    transaction.end(False)
+                except Exception as ex:
+                    self.logger.warn("Rollback of %s failed: %s" % (table_name, ex))
+            if self.progress is not None:
+                self.progress.finish(table_name)
+            if connector is not None:
+                self.pool.checkin(connector)
+
+    def read_batches(self, cursrc, encoders, key_index, timings, sizer=None):
+        """
+            Fetch and encode the rows of a copy_table_data task in batches of --batchsize rows (fewer
+            when --maxrows is reached first)
+            @:param encoders (first row encoder, next rows encoder) of the INSERT, None with --executemany
+                    (the values are bound by the driver)
+            @:param key_index column of the rows whose last value is kept, None not to keep it
+            @:param timings dict the 'fetch' and 'encode' seconds are added to
+            @:param sizer BatchSizer giving the rows of the next batch (--batchsize auto), whose statement size
+                    budget also ends a batch, None for --batchsize rows
+            yields (rows, estimated size, key of the last row, rows left out) where rows are the encoded rows or
+            the values and the rows left out are the ones that can't be encoded
+        """
+        batchsize = self.params.batchsize if sizer is None else sizer.rows
+        max_bytes = None if sizer is None else sizer.max_bytes
+        maxrows = self.params.maxrows
+        rows = []
+        sz = 0.0
+        last_key = None
+        skipped = 0
+        fetch_start = time.time()
+        for line in cursrc:  # Read source cursor (SELECT)
+            encode_start = time.time()
+            timings['fetch'] += encode_start - fetch_start
+            row = self.strip_row(line)
+            if key_index is not None:
+                last_key = line[key_index]
+            if encoders is None:
+                # Keep the values as they are, the driver binds them to the parameter markers
+                for value in row:
+                    sz += 1 if value is None else len(value) if isinstance(value, basestring) else 8
+                rows.append(row)
+            else:
+                try:
+                    s = encoders[1 if rows else 0].encode(row)
+                    rows.append(s)
+                    sz += len(s)
+                except Exception as ex:
+                    # a row that can't be encoded is logged and left out, the table goes on
+                    self.logger.debug(row)
+                    self.logger.exception(ex)
+                    skipped += 1
+            fetch_start = time.time()
+            timings['encode'] += fetch_start - encode_start
+
+            if len(rows) >= batchsize or (len(rows) + self.inserted_queries_number.get()) >= maxrows or \
+                    (max_bytes is not None and sz >= max_bytes):
+                yield (rows, sz, last_key, skipped)
+                rows = []
+                sz = 0.0
+                skipped = 0
+                if sizer is not None:
+                    batchsize = sizer.rows
+                fetch_start = time.time()
+        if rows or skipped:
+            yield (rows, sz, last_key, skipped)
 
     def __is_reached_insertion_limit(self, thread_id):
         if self.inserted_queries_number.get() >= self.params.maxrows:
@@ -1391,6 +2345,24 @@ class ConvertorUtil:
                 self.logger.warn('View Declaration:\n' + error[0].rstrip('\n'))
 
 
+# ConvertorUtil of the running load, inherited by the forked workers of --executor process
+_process_util = None
+
+
+def _init_process_worker():
+    """
+        Open the source and target connections of a pool process
+    """
+    _process_util.pool = ConnectorPool(_process_util.params.src, _process_util.params.dest, 1)
+
+
+def _copy_tables_worker(tasks):
+    """
+        Run the copy_table_data tasks of one work item in a pool process
+    """
+    return _process_util.copy_tables(tasks)
+
+
 class SchemaConvertor:
     def __init__(self, params):
         self.params = params
@@ -1399,7 +2371,8 @@ class SchemaConvertor:
 
     def convert(self):
         with dbconnector(self.params.src) as source_connector:
-            connect = self.params.loaddl or self.params.loadata or self.params.loadtest
+            connect = self.params.loaddl or self.params.loadata or self.params.loadtest or \
+                      self.params.load_vwload or self.params.load_cpvwl
             with dbconnector(self.params.dest, connect) as target_connector:
                
                 global log_dtm_db 
@@ -1411,132 +2384,172 @@ class SchemaConvertor:
                         global log_dtm_txt
                         log_dtm_txt = self.params.filetag
 
-                if self.params.cretab:
+                # threads loading data check out their own pairs, the phases below use pair #0
+                self.util.pool = ConnectorPool(self.params.src, self.params.dest, self.params.threads,
+                                               (source_connector, target_connector), connect)
+                # read the source metadata needed by the phases below once, queries run concurrently
+                with self.util.report.phase('catalog'):
                     try:
-                        tbs = self.util.generate_tb(source_connector, target_connector.dbtype)
-                        self.util.write_txt_file('tab', tbs)
-                        if self.params.mapping :
-                            ## create a nice readable output
-                            print "\n"
-                            print "%-*s  %-*s " % (32,"Source Column",40,"Target Column")
-                            print "=============================================="
-                            for prt in types_mapping:
-                                print "%-*s  %-*s" % (32,prt,40,types_mapping[prt])
-                            print "\n"
+                        self.util.load_metadata_cache(source_connector)
+                        self.util.catalog.prefetch(
+                            self.util.metadata_queries(source_connector.dbtype, target_connector.dbtype))
+                        self.util.save_metadata_cache()
+                    except IndexError as ex:
+                        # no catalog definitions for the source type (e.g. --loadtest on sqlite)
+                        self.logger.debug(ex)
                     except Exception as ex:
                         self.logger.exception(ex)
-                        self.util.handle_error(ex)
 
-                if self.params.creview:
-                    try:
-                        views = self.util.generate_views(source_connector, target_connector.dbtype)
-                        self.util.write_txt_file('viw', views)
-                    except Exception as ex:
-                        self.logger.exception(ex)
-                        self.util.handle_error(ex)
+                if self.params.cretab:
+                    (source_connector, target_connector) = self.util.pool.primary()[:2]
+                    with self.util.report.phase('ddl_generation'):
+                        try:
+                            tbs = self.util.generate_tb(source_connector, target_connector.dbtype)
+                            self.util.write_txt_file('tab', tbs)
+                            if self.params.mapping :
+                                ## create a nice readable output
+                                print "\n"
+                                print "%-*s  %-*s " % (32,"Source Column",40,"Target Column")
+                                print "=============================================="
+                                for prt in types_mapping:
+                                    print "%-*s  %-*s" % (32,prt,40,types_mapping[prt])
+                                print "\n"
+                        except Exception as ex:
+                            self.logger.exception(ex)
+                            self.util.handle_error(ex)
 
-                if self.params.loaddl and self.params.cretab:
-                    for s in tbs:
+                if self.params.creview:
+                    (source_connector, target_connector) = self.util.pool.primary()[:2]
+                    with self.util.report.phase('ddl_generation'):
                         try:
-                            self.logger.debug(s)
-                            # do not alter DB in trial mode
-                            if not self.params.trial:
-                                target_connector.execute(s)
+                            views = self.util.generate_views(source_connector, target_connector.dbtype)
+                            self.util.write_txt_file('viw', views)
                         except Exception as ex:
                             self.logger.exception(ex)
                             self.util.handle_error(ex)
 
+                if self.params.loaddl and self.params.cretab:
+                    (source_connector, target_connector) = self.util.pool.primary()[:2]
+                    with self.util.report.phase('ddl_execution'):
+                        for s in tbs:
+                            try:
+                                self.logger.debug(s)
+                                # do not alter DB in trial mode
+                                if not self.params.trial:
+                                    target_connector.execute(s)
+                            except Exception as ex:
+                                self.logger.exception(ex)
+                                self.util.handle_error(ex)
+
                 if self.params.loaddl and self.params.creview:
-                    try:
-                        self.util.create_views(target_connector, views)
-                    except Exception as ex:
-                        self.logger.exception(ex)
-                        self.util.handle_error(ex)
+                    (source_connector, target_connector) = self.util.pool.primary()[:2]
+                    with self.util.report.phase('ddl_execution'):
+                        try:
+                            self.util.create_views(target_connector, views)
+                        except Exception as ex:
+                            self.logger.exception(ex)
+                            self.util.handle_error(ex)
 
                 if self.params.loadata:
-                    try:
-                        self.util.load_data(source_connector, target_connector)
-                    except Exception as ex:
-                        self.logger.exception(ex)
-                        self.util.handle_error(ex)
+                    (source_connector, target_connector) = self.util.pool.primary()[:2]
+                    with self.util.report.phase('data_load'):
+                        try:
+                            self.util.load_data(source_connector, target_connector)
+                        except Exception as ex:
+                            self.logger.exception(ex)
+                            self.util.handle_error(ex)
 
                 if self.params.unload:
-                    try:
-                        self.util.unload_data(source_connector, target_connector.dbtype)
-                    except Exception as ex:
-                        self.logger.exception(ex)
-                        self.util.handle_error(ex)
+                    (source_connector, target_connector) = self.util.pool.primary()[:2]
+                    with self.util.report.phase('unload'):
+                        try:
+                            self.util.unload_data(source_connector, target_connector.dbtype)
+                        except Exception as ex:
+                            self.logger.exception(ex)
+                            self.util.handle_error(ex)
 
                 if self.params.loadtest:
-                    try:
-                        self.util.load_test(source_connector, target_connector)
-                    except Exception as ex:
-                        self.logger.exception(ex)
-                        self.util.handle_error(ex)
+                    (source_connector, target_connector) = self.util.pool.primary()[:2]
+                    with self.util.report.phase('load_test'):
+                        try:
+                            self.util.load_test(source_connector, target_connector)
+                        except Exception as ex:
+                            self.logger.exception(ex)
+                            self.util.handle_error(ex)
                 if self.params.dmpobj:
-                    try:
-                        self.util.generate_obj_proc(source_connector, target_connector) 
-                        self.util.generate_obj_trigger(source_connector, target_connector) 
-                        self.util.generate_obj_function(source_connector, target_connector) 
-                        self.util.generate_obj_package(source_connector, target_connector) 
+                    (source_connector, target_connector) = self.util.pool.primary()[:2]
+                    with self.util.report.phase('ddl_generation'):
+                        try:
+                            self.util.generate_obj_proc(source_connector, target_connector) 
+                            self.util.generate_obj_trigger(source_connector, target_connector) 
+                            self.util.generate_obj_function(source_connector, target_connector) 
+                            self.util.generate_obj_package(source_connector, target_connector) 
 
-                    except Exception as ex:
-                        self.logger.exception(ex)
-                        self.util.handle_error(ex)
+                        except Exception as ex:
+                            self.logger.exception(ex)
+                            self.util.handle_error(ex)
 
                 if self.params.creall:
-                    try:
-                        uks = self.util.generate_uk(source_connector, target_connector.dbtype)
-                        ixs = self.util.generate_ix(source_connector, target_connector.dbtype)
-                        fks = self.util.generate_fk(source_connector, target_connector.dbtype)
-                        views = self.util.generate_views(source_connector, target_connector.dbtype)
-                        self.util.generate_obj_proc(source_connector, target_connector) 
-                        self.util.generate_obj_trigger(source_connector, target_connector) 
-                        self.util.generate_obj_function(source_connector, target_connector) 
-                        self.util.generate_obj_package(source_connector, target_connector) 
-                        self.util.write_txt_file('all', uks+ ixs + fks + views)
-                        """
-                           generate_obj_* procedures write their own seperate files out
-                        """                           
-                    except Exception as ex:
-                        self.logger.exception(ex)
-                        self.util.handle_error(ex)
-
-                if self.params.creindex:
-                    try:
-                        uks = self.util.generate_uk(source_connector, target_connector.dbtype)
-                        ixs = self.util.generate_ix(source_connector, target_connector.dbtype)
-                        fks = self.util.generate_fk(source_connector, target_connector.dbtype)
-                        self.util.write_txt_file('index', uks + ixs + fks)
-                    except Exception as ex:
-                        self.logger.exception(ex)
-                        self.util.handle_error(ex)
-
-                if self.params.loaddl and self.params.creall:
-                    queries = uks + ixs + fks
-                    for s in queries:
-                        self.logger.debug(s)
+                    (source_connector, target_connector) = self.util.pool.primary()[:2]
+                    with self.util.report.phase('ddl_generation'):
                         try:
-                            # do not alter DB in trial mode
-                            if not self.params.trial:
-                                target_connector.execute(s)
+                            uks = self.util.generate_uk(source_connector, target_connector.dbtype)
+                            ixs = self.util.generate_ix(source_connector, target_connector.dbtype)
+                            fks = self.util.generate_fk(source_connector, target_connector.dbtype)
+                            views = self.util.generate_views(source_connector, target_connector.dbtype)
+                            self.util.generate_obj_proc(source_connector, target_connector) 
+                            self.util.generate_obj_trigger(source_connector, target_connector) 
+                            self.util.generate_obj_function(source_connector, target_connector) 
+                            self.util.generate_obj_package(source_connector, target_connector) 
+                            self.util.write_txt_file('all', uks+ ixs + fks + views)
+                            """
+                               generate_obj_* procedures write their own seperate files out
+                            """                           
                         except Exception as ex:
                             self.logger.exception(ex)
                             self.util.handle_error(ex)
-                    self.util.create_views(target_connector, views)
 
-                if self.params.loaddl and self.params.creindex:
-                    queries = uks + ixs + fks
-                    for s in queries:
-                        self.logger.debug(s)
+                if self.params.creindex:
+                    (source_connector, target_connector) = self.util.pool.primary()[:2]
+                    with self.util.report.phase('ddl_generation'):
                         try:
-                            # do not alter DB in trial mode
-                            if not self.params.trial:
-                                target_connector.execute(s)
+                            uks = self.util.generate_uk(source_connector, target_connector.dbtype)
+                            ixs = self.util.generate_ix(source_connector, target_connector.dbtype)
+                            fks = self.util.generate_fk(source_connector, target_connector.dbtype)
+                            self.util.write_txt_file('index', uks + ixs + fks)
                         except Exception as ex:
                             self.logger.exception(ex)
                             self.util.handle_error(ex)
 
+                if self.params.loaddl and self.params.creall:
+                    (source_connector, target_connector) = self.util.pool.primary()[:2]
+                    with self.util.report.phase('ddl_execution'):
+                        queries = uks + ixs + fks
+                        for s in queries:
+                            self.logger.debug(s)
+                            try:
+                                # do not alter DB in trial mode
+                                if not self.params.trial:
+                                    target_connector.execute(s)
+                            except Exception as ex:
+                                self.logger.exception(ex)
+                                self.util.handle_error(ex)
+                        self.util.create_views(target_connector, views)
+
+                if self.params.loaddl and self.params.creindex:
+                    (source_connector, target_connector) = self.util.pool.primary()[:2]
+                    with self.util.report.phase('ddl_execution'):
+                        queries = uks + ixs + fks
+                        for s in queries:
+                            self.logger.debug(s)
+                            try:
+                                # do not alter DB in trial mode
+                                if not self.params.trial:
+                                    target_connector.execute(s)
+                            except Exception as ex:
+                                self.logger.exception(ex)
+                                self.util.handle_error(ex)
+
                 if not self.params.quiet :
 #subprocess.check_output(['ls','-l']) #all that is technically needed...
                     print 'INFO : DDL ouput files generated:'
@@ -1544,27 +2557,21 @@ class SchemaConvertor:
                     print 'INFO : log file generated:'
                     print subprocess.check_output(['ls','-l', '*.log'])
 
-                if self.params.load_vwload:
-                    try:
-
-                        if not self.params.quiet :
-#subprocess.check_output(['ls','-l']) #all that is technically needed...
-                            print 'INFO : unloaded files:'
-                            print subprocess.check_output(['ls','-l', self.params.source_schema + '*'])
-#                            self.util.load_data_vwload(source_connector, target_connector)
-                    except Exception as ex:
-                        self.logger.exception(ex)
-                        self.util.handle_error(ex)
-
-                if self.params.load_cpvwl:
-                    try:
-                        if not self.params.quiet :
-#subprocess.check_output(['ls','-l']) #all that is technically needed...
-                           print subprocess.check_output(['ls','-l', self.params.source_schema + '*'])
-                           print  self.params.source_schema + '*'
-#                        self.util.load_data_vwload(source_connector, target_connector)
-                    except Exception as ex:
-                        self.logger.exception(ex)
-                        self.util.handle_error(ex)
+                if self.params.load_vwload or self.params.load_cpvwl:
+                    (source_connector, target_connector) = self.util.pool.primary()[:2]
+                    with self.util.report.phase('data_load'):
+                        try:
+                            self.util.load_data_vwload(source_connector, target_connector)
+                        except Exception as ex:
+                            self.logger.exception(ex)
+                            self.util.handle_error(ex)
 
+                self.util.save_metadata_cache()
+                self.util.pool.close()
 
+                fname = self.params.program_name + '_' + log_dtm_txt + '_' + log_dtm_db + '_report.json'
+                try:
+                    self.util.report.write(fname)
+                    self.logger.info("Run report written to %s" % fname)
+                except Exception as ex:
+                    self.logger.exception(ex)
@@ -0,0 +1,174 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*
+
+# Copyright 2020 Actian Corporation
+
+#    Licensed under the Apache License, Version 2.0 (the "License");
+#    you may not use this file except in compliance with the License.
+#    You may obtain a copy of the License at
+
+#      http://www.apache.org/licenses/LICENSE-2.0
+
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS,
+#    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#    See the License for the specific language governing permissions and
+#    limitations under the License.
+
+import os
+import time
+import logging
+import cPickle
+from collections import OrderedDict
+from threading import Lock
+
+from concurrent.futures import ThreadPoolExecutor, wait
+from driverTools import dbconnector
+
+# Metadata definitions (<select id="..."> of dbmv_new.xml) whose first two columns are schema and table
+table_definitions = ('tbDefinition', 'ukDefinition', 'fkDefinition', 'ixDefinition', 'viwDefinition')
+# seconds a snapshot of a source without last DDL time (no signature) is reused
+unsigned_max_age = 3600
+
+
+class SourceCatalog:
+    """
+        In-memory snapshot of the source catalog: the rows of every metadata query
+        (tbDefinition, ukDefinition, ixDefinition, fkDefinition, viwDefinition, ProcDefinition, ...)
+        fetched once per run and shared by the generate_* phases, load_data and unload_data.
+        A query is identified by its text once substituted, so the same definition asked with
+        different parameters (e.g. types_to_skip) is fetched once per variant.
+    """
+
+    def __init__(self, src, strip_row):
+        """
+            @:param src source connect string, used to open the connections of prefetch()
+            @:param strip_row function applied to every fetched row (ConvertorUtil.strip_row)
+        """
+        self.src = src
+        self.strip_row = strip_row
+        self.logger = logging.getLogger(__name__)
+        self.lock = Lock()
+        # query text -> (definition identifier, rows)
+        self.results = {}
+        # results changed since load()/save()
+        self.changed = False
+
+    def rows(self, source_connector, identifier, sql):
+        """
+            Rows of a metadata query, fetched with source_connector the first time only.
+            Raises ValueError when the query cannot be run.
+        """
+        result = self.results.get(sql)
+        if result is None:
+            with self.lock:
+                result = self.results.get(sql)
+                if result is None:
+                    result = (identifier, self.fetch(source_connector, identifier, sql))
+                    self.results[sql] = result
+                    self.changed = True
+        return result[1]
+
+    def fetch(self, source_connector, identifier, sql):
+        t1 = time.time()
+        self.logger.debug(sql)
+        cur = source_connector.execute(sql)
+        if cur is None:
+            raise ValueError("Failed to read the %s metadata of the source database" % identifier)
+        rows = [self.strip_row(line) for line in cur]
+        self.logger.info("Catalog %s: %d rows - Elapsed time(s): %f" % (identifier, len(rows), time.time() - t1))
+        return rows
+
+    def prefetch(self, queries):
+        """
+            Run the metadata queries not fetched yet concurrently, each one with its own source connection.
+            A query that fails here is run again (and reports its error) when a phase asks for it.
+            @:param queries list of (definition identifier, query text)
+        """
+        todo = OrderedDict((sql, identifier) for (identifier, sql) in queries
+                           if sql.strip() != "" and sql not in self.results)
+        if not todo:
+            return
+        t1 = time.time()
+        pool = ThreadPoolExecutor(len(todo))
+        futures = [pool.submit(self.prefetch_query, identifier, sql) for (sql, identifier) in todo.items()]
+        wait(futures)
+        pool.shutdown()
+        self.logger.info("Catalog snapshot: %d queries - Elapsed time(s): %f" % (len(todo), time.time() - t1))
+
+    def prefetch_query(self, identifier, sql):
+        try:
+            with dbconnector(self.src) as source_connector:
+                rows = self.fetch(source_connector, identifier, sql)
+            with self.lock:
+                if sql not in self.results:
+                    self.results[sql] = (identifier, rows)
+                    self.changed = True
+        except Exception as ex:
+            self.logger.warn("Catalog %s not prefetched: %s" % (identifier, ex))
+
+    def tables(self, identifier='tbDefinition'):
+        """
+            Model of the snapshot: {(schema, table): [rows of identifier]} in query order,
+            for the definitions listed in table_definitions. When several variants of the query
+            were fetched, the largest one is used.
+        """
+        if identifier not in table_definitions:
+            raise ValueError("%s rows are not indexed by schema and table" % identifier)
+        variants = [rows for (name, rows) in self.results.values() if name == identifier]
+        result = OrderedDict()
+        for row in (max(variants, key=len) if variants else []):
+            result.setdefault((row[0], row[1]), []).append(row)
+        return result
+
+    def load(self, fname, key, signature):
+        """
+            Reuse the snapshot saved in fname by a previous run.
+            @:param key source database and schema filter the snapshot must have been taken for
+            @:param signature state of the source catalog (e.g. last DDL time), None when the source
+                    does not expose one: the snapshot is then reused for unsigned_max_age seconds
+            @:return: True when the snapshot has been loaded
+        """
+        if not os.path.exists(fname):
+            return False
+        try:
+            with open(fname, 'rb') as f:
+                cache = cPickle.load(f)
+        except Exception as ex:
+            self.logger.warn("Metadata cache %s ignored: %s" % (fname, ex))
+            return False
+        if cache.get('key') != key:
+            self.logger.info("Metadata cache %s ignored: taken for another source" % fname)
+            return False
+        if signature is not None and cache.get('signature') != signature:
+            self.logger.info("Metadata cache %s ignored: source catalog changed since %s" % (
+                fname, time.ctime(cache.get('saved'))))
+            return False
+        if signature is None and (cache.get('signature') is not None or
+                                  time.time() - cache.get('saved', 0) > unsigned_max_age):
+            self.logger.info("Metadata cache %s ignored: taken %s, source changes can't be detected" % (
+                fname, time.ctime(cache.get('saved'))))
+            return False
+        with self.lock:
+            self.results.update(cache['results'])
+            self.changed = False
+        self.logger.info("Metadata cache %s of %s reused (%d queries)%s" % (
+            fname, time.ctime(cache.get('saved')), len(cache['results']),
+            "" if signature is not None else " - source changes are not detected for %d minutes, use"
+                                             " --refresh-metadata" % (unsigned_max_age / 60)))
+        return True
+
+    def save(self, fname, key, signature):
+        """
+            Write the snapshot to fname when it changed since load()
+        """
+        if not self.changed:
+            return
+        with self.lock:
+            cache = {'key': key, 'signature': signature, 'saved': time.time(), 'results': dict(self.results)}
+            self.changed = False
+        tmpname = fname + '.tmp'
+        with open(tmpname, 'wb') as f:
+            cPickle.dump(cache, f, cPickle.HIGHEST_PROTOCOL)
+        os.rename(tmpname, fname)
+        self.logger.debug("Metadata cache %s saved (%d queries)" % (fname, len(cache['results'])))
@@ -0,0 +1,119 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*
+
+# Copyright 2020 Actian Corporation
+
+#    Licensed under the Apache License, Version 2.0 (the "License");
+#    you may not use this file except in compliance with the License.
+#    You may obtain a copy of the License at
+
+#      http://www.apache.org/licenses/LICENSE-2.0
+
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS,
+#    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#    See the License for the specific language governing permissions and
+#    limitations under the License.
+
+import os
+import logging
+import xml.dom.minidom
+
+from string import Template
+from threading import Lock
+from xml.dom.minidom import Node
+
+
+class TemplateRegistry(object):
+    """
+        SQL/ODBC definitions of an XML configuration file (dbmv_new.xml, driverTools.xml)
+        parsed once and indexed by (dbtype, kind, id).
+        The file is parsed again when its modification time changes.
+    """
+
+    def __init__(self, xml_path):
+        self.xml_path = xml_path
+        self.logger = logging.getLogger(__name__)
+        self.lock = Lock()
+        self.mtime = None
+        self.sections = set()
+        self.texts = {}
+        self.templates = {}
+
+    def load(self):
+        """
+            Parse the XML file and index the text of every definition.
+            First element of a given tag is the section of a dbtype (as getElementsByTagName(dbtype)[0]).
+            In a section, the last element with the same tag and id wins.
+        """
+        xmldoc = xml.dom.minidom.parse(self.xml_path)
+        sections = set()
+        texts = {}
+        for section in xmldoc.documentElement.getElementsByTagName('*'):
+            dbtype = section.tagName
+            if dbtype in sections:
+                continue
+            sections.add(dbtype)
+            if section.firstChild is not None and section.firstChild.nodeType == Node.TEXT_NODE:
+                texts[(dbtype, None, None)] = section.firstChild.data
+            for node in section.getElementsByTagName('*'):
+                for child in node.childNodes:
+                    if child.nodeType == Node.TEXT_NODE:
+                        texts[(dbtype, node.tagName, node.getAttribute("id"))] = child.data
+                        break
+        self.sections = sections
+        self.texts = texts
+        self.templates = {}
+        self.logger.debug("%d definitions loaded from %s" % (len(texts), self.xml_path))
+
+    def refresh(self):
+        """
+            Reload the file when it changed since the last load
+        """
+        mtime = os.path.getmtime(self.xml_path)
+        if mtime != self.mtime:
+            with self.lock:
+                if mtime != self.mtime:
+                    self.load()
+                    self.mtime = mtime
+
+    def get(self, dbtype, kind=None, identifier=None):
+        """
+            Get the raw text of a definition
+            @:param dbtype Database type "mysql, mssql, ..."
+            @:param kind Sqltype : select, create, load, ... (None for the section text itself)
+            @:param identifier Unique Identifier
+        """
+        self.refresh()
+        if dbtype not in self.sections:
+            raise IndexError("No '%s' definitions in %s" % (dbtype, self.xml_path))
+        return self.texts.get((dbtype, kind, identifier), "")
+
+    def template(self, dbtype, kind, identifier):
+        """
+            Get the definition as a compiled string.Template (text is stripped)
+        """
+        text = self.get(dbtype, kind, identifier)
+        key = (dbtype, kind, identifier)
+        result = self.templates.get(key)
+        if result is None:
+            result = Template(text.strip())
+            self.templates[key] = result
+        return result
+
+
+_registries = {}
+_registries_lock = Lock()
+
+
+def get_registry(xml_path):
+    """
+        Return the shared registry of xml_path
+    """
+    key = os.path.abspath(xml_path)
+    with _registries_lock:
+        registry = _registries.get(key)
+        if registry is None:
+            registry = TemplateRegistry(xml_path)
+            _registries[key] = registry
+    return registry
@@ -0,0 +1,180 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*
+
+# Copyright 2020 Actian Corporation
+
+#    Licensed under the Apache License, Version 2.0 (the "License");
+#    you may not use this file except in compliance with the License.
+#    You may obtain a copy of the License at
+
+#      http://www.apache.org/licenses/LICENSE-2.0
+
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS,
+#    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#    See the License for the specific language governing permissions and
+#    limitations under the License.
+
+import os
+import json
+import zlib
+import hashlib
+from collections import OrderedDict
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+try:
+    import lz4.frame as lz4_frame
+except ImportError:
+    lz4_frame = None
+
+# --compress value -> (file suffix, python module needed, None when built in)
+compressions = OrderedDict([('gzip', ('.gz', None)),
+                            ('zstd', ('.zst', 'zstandard')),
+                            ('lz4', ('.lz4', 'lz4'))])
+# bytes of encoded lines buffered before they are compressed and written
+buffer_size = 256 * 1024
+
+
+def compression_available(compression):
+    """
+        @:return: False when the python module of a --compress value is not installed
+    """
+    return {'zstd': zstandard, 'lz4': lz4_frame}.get(compression, True) is not None
+
+
+class Lz4Compressor:
+    """
+        lz4.frame compressor with the compress/flush interface of zlib.compressobj
+    """
+
+    def __init__(self):
+        self.compressor = lz4_frame.LZ4FrameCompressor()
+        self.header = self.compressor.begin()
+
+    def compress(self, data):
+        (header, self.header) = (self.header, '')
+        return header + self.compressor.compress(data)
+
+    def flush(self):
+        return self.header + self.compressor.flush()
+
+
+class UnloadWriter:
+    """
+        Delimited lines of an unloaded table, UTF-8 encoded and optionally compressed (--compress) and
+        split in files of about chunk_size bytes of lines (--splitsize): <table>.0001.txt.gz, ... A line
+        is never split across two files. Every file is described by rows, bytes of lines, bytes
+        stored and SHA-256 of the stored bytes, which write_manifest records in <table>.manifest.json.
+        Without compression nor chunks the lines go to fname as they are.
+    """
+
+    def __init__(self, fname, compression=None, chunk_size=0):
+        """
+            @:param fname file of the table, the base of the chunk names
+            @:param compression --compress value, None not to compress
+            @:param chunk_size bytes of lines per file, 0 for a single file
+        """
+        self.fname = fname
+        self.compression = compression
+        self.chunk_size = chunk_size
+        self.chunks = []
+        self.f = None
+        self.compressor = None
+        self.checksum = None
+        self.chunk = None
+        self.buffer = []
+        self.buffered = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    @property
+    def files(self):
+        return [chunk['file'] for chunk in self.chunks]
+
+    def chunk_name(self, number):
+        suffix = compressions[self.compression][0] if self.compression else ''
+        if not self.chunk_size:
+            return self.fname + suffix
+        (base, ext) = os.path.splitext(self.fname)
+        return "%s.%04d%s%s" % (base, number, ext, suffix)
+
+    def open(self):
+        fname = self.chunk_name(len(self.chunks) + 1)
+        self.f = open(fname, 'wb')
+        self.checksum = hashlib.sha256()
+        if self.compression == 'gzip':
+            self.compressor = zlib.compressobj(6, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+        elif self.compression == 'zstd':
+            self.compressor = zstandard.ZstdCompressor().compressobj()
+        elif self.compression == 'lz4':
+            self.compressor = Lz4Compressor()
+        else:
+            self.compressor = None
+        self.chunk = OrderedDict([('file', fname), ('rows', 0), ('bytes', 0), ('stored_bytes', 0), ('sha256', None)])
+        self.chunks.append(self.chunk)
+
+    def write(self, line):
+        """
+            @:param line unicode line, with its end of line
+        """
+        if self.f is None:
+            self.open()
+        data = line.encode('utf-8')
+        self.buffer.append(data)
+        self.buffered += len(data)
+        self.chunk['rows'] += 1
+        self.chunk['bytes'] += len(data)
+        if self.buffered >= buffer_size:
+            self.flush()
+        if self.chunk_size and self.chunk['bytes'] >= self.chunk_size:
+            self.end_chunk()
+
+    def store(self, data):
+        if data:
+            self.f.write(data)
+            self.checksum.update(data)
+            self.chunk['stored_bytes'] += len(data)
+
+    def flush(self):
+        data = ''.join(self.buffer)
+        self.buffer = []
+        self.buffered = 0
+        self.store(data if self.compressor is None else self.compressor.compress(data))
+
+    def end_chunk(self):
+        self.flush()
+        if self.compressor is not None:
+            self.store(self.compressor.flush())
+        self.f.close()
+        self.f = None
+        self.chunk['sha256'] = self.checksum.hexdigest()
+
+    def close(self):
+        if self.f is None and not self.chunks:
+            # no row: an empty file, as for an uncompressed single file
+            self.open()
+        if self.f is not None:
+            self.end_chunk()
+
+    def write_manifest(self, table_name, **attributes):
+        """
+            Write <table>.manifest.json
+            @:param attributes more entries of the manifest (e.g. field delimiter)
+            @:return: name of the manifest
+        """
+        fname = os.path.splitext(self.fname)[0] + '.manifest.json'
+        manifest = OrderedDict([('table', table_name), ('compression', self.compression),
+                                ('rows', sum(chunk['rows'] for chunk in self.chunks)),
+                                ('bytes', sum(chunk['bytes'] for chunk in self.chunks))])
+        manifest.update(sorted(attributes.items()))
+        manifest['chunks'] = [OrderedDict(chunk, file=os.path.basename(chunk['file'])) for chunk in self.chunks]
+        with open(fname, 'w') as f:
+            json.dump(manifest, f, indent=2)
+        return fname